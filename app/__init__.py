@@ -4,10 +4,34 @@ Implements app factory pattern with security, extensions, and blueprints.
 """
 from flask import Flask, render_template, session
 from app.config import get_config
-from app.extensions import csrf, limiter
+from app.extensions import csrf, cache, limiter, fixed_limiter, RedisSessionInterface
 import os
 
 
+# Content Security Policy, built once at import
+CONTENT_SECURITY_POLICY = (
+    "default-src 'self'; "
+    "script-src 'self' 'unsafe-inline' https://cdn.tailwindcss.com; "
+    "style-src 'self' 'unsafe-inline' https://cdn.tailwindcss.com https://fonts.googleapis.com; "
+    "font-src 'self' https://fonts.gstatic.com; "
+    "img-src 'self' data: https:; "
+    "connect-src 'self' https://*.supabase.co;"
+)
+
+# Security headers added to every response
+SECURITY_HEADERS = (
+    ('Content-Security-Policy', CONTENT_SECURITY_POLICY),
+    ('X-Content-Type-Options', 'nosniff'),  # Prevent MIME sniffing
+    ('X-Frame-Options', 'DENY'),  # Prevent framing
+    ('X-XSS-Protection', '1; mode=block'),  # XSS Protection
+)
+
+# Production adds HSTS to force HTTPS
+PRODUCTION_SECURITY_HEADERS = SECURITY_HEADERS + (
+    ('Strict-Transport-Security', 'max-age=31536000; includeSubDomains'),
+)
+
+
 def create_app(config_name=None):
     """
     Application factory for creating Flask app instances.
@@ -31,35 +55,23 @@ def create_app(config_name=None):
     
     # Initialize extensions
     csrf.init_app(app)
+    cache.init_app(app)
     limiter.init_app(app)
+    fixed_limiter.init_app(app)
+    
+    if app.config.get('SESSION_BACKEND') == 'redis':
+        app.session_interface = RedisSessionInterface()
     
     # Configure security headers
+    security_headers = (
+        PRODUCTION_SECURITY_HEADERS if app.config.get('ENV') == 'production'
+        else SECURITY_HEADERS
+    )
+    
     @app.after_request
     def set_security_headers(response):
         """Add security headers to all responses."""
-        # Content Security Policy
-        response.headers['Content-Security-Policy'] = (
-            "default-src 'self'; "
-            "script-src 'self' 'unsafe-inline' https://cdn.tailwindcss.com; "
-            "style-src 'self' 'unsafe-inline' https://cdn.tailwindcss.com https://fonts.googleapis.com; "
-            "font-src 'self' https://fonts.gstatic.com; "
-            "img-src 'self' data: https:; "
-            "connect-src 'self' https://*.supabase.co;"
-        )
-        
-        # HSTS - Force HTTPS (only in production)
-        if app.config.get('ENV') == 'production':
-            response.headers['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
-        
-        # Prevent MIME sniffing
-        response.headers['X-Content-Type-Options'] = 'nosniff'
-        
-        # Prevent framing
-        response.headers['X-Frame-Options'] = 'DENY'
-        
-        # XSS Protection
-        response.headers['X-XSS-Protection'] = '1; mode=block'
-        
+        response.headers.update(security_headers)
         return response
     
     # Register error handlers
@@ -86,6 +98,14 @@ def create_app(config_name=None):
     # Register blueprints
     register_blueprints(app)
     
+    # Build the API key cipher once up front
+    from app.services.security_service import SecurityService
+    SecurityService.init_app(app)
+    
+    # Preload prompt templates so the first generation doesn't hit disk
+    from app.services.ai_service import AIService
+    AIService.preload_templates()
+    
     # Context processors
     @app.context_processor
     def inject_user():
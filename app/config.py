@@ -9,6 +9,12 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+# Redis backs sessions, rate limits, the shared cache and buffered key usage.
+# Without REDIS_URL each falls back to a single-process default (signed-cookie
+# sessions, in-memory limits and cache, direct usage writes).
+# RATELIMIT_STORAGE_URL and CACHE_REDIS_URL default to REDIS_URL.
+REDIS_CONFIGURED = bool(os.environ.get('REDIS_URL'))
+
 
 class Config:
     """Base configuration with common settings."""
@@ -20,15 +26,18 @@ class Config:
     SUPABASE_URL = os.environ.get('SUPABASE_URL')
     SUPABASE_ANON_KEY = os.environ.get('SUPABASE_ANON_KEY')
     SUPABASE_SERVICE_ROLE_KEY = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
+    SUPABASE_TIMEOUT_SECONDS = int(os.environ.get('SUPABASE_TIMEOUT_SECONDS', 10))  # PostgREST request timeout
     
     # Encryption
     FERNET_SECRET_KEY = os.environ.get('FERNET_SECRET_KEY')
     
-    # Session Configuration
+    # Session Configuration ('redis' keeps data server-side, 'cookie' uses Flask's signed cookie)
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'redis' if REDIS_CONFIGURED else 'cookie')
     SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', 'True') == 'True'
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
     PERMANENT_SESSION_LIFETIME = timedelta(days=1)
+    USER_CACHE_SECONDS = int(os.environ.get('USER_CACHE_SECONDS', 60))  # Cached user profile TTL (shared cache)
     
     # CSRF Protection
     WTF_CSRF_ENABLED = True
@@ -38,8 +47,26 @@ class Config:
     # Rate Limiting
     RATELIMIT_ENABLED = True
     RATELIMIT_DEFAULT = os.environ.get('RATELIMIT_DEFAULT', '100/hour')
-    RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL', 'memory://')
-    RATELIMIT_STRATEGY = 'fixed-window'
+    RATELIMIT_STORAGE_URI = (
+        os.environ.get('RATELIMIT_STORAGE_URL') or os.environ.get('REDIS_URL') or 'memory://'
+    )
+    # Don't stall requests on Redis hiccups
+    RATELIMIT_STORAGE_OPTIONS = (
+        {'socket_connect_timeout': 1} if RATELIMIT_STORAGE_URI.startswith('redis') else {}
+    )
+    RATELIMIT_STRATEGY = 'moving-window'
+    
+    # Caching (completed generations are immutable and cached for reads)
+    CACHE_TYPE = 'RedisCache' if REDIS_CONFIGURED else 'SimpleCache'
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL') or os.environ.get('REDIS_URL')
+    CACHE_DEFAULT_TIMEOUT = 300
+    GENERATION_CACHE_SECONDS = int(os.environ.get('GENERATION_CACHE_SECONDS', 3600))
+    API_KEY_PROBE_CACHE_SECONDS = int(os.environ.get('API_KEY_PROBE_CACHE_SECONDS', 120))  # Successful key tests
+    
+    # Redis for shared app state (sessions, OTP codes, buffered API key usage counters)
+    REDIS_URL = os.environ.get('REDIS_URL')
+    KEY_USAGE_BUFFERED = REDIS_CONFIGURED  # Count key usage in Redis, flush to Postgres in batches
+    KEY_USAGE_FLUSH_SECONDS = int(os.environ.get('KEY_USAGE_FLUSH_SECONDS', 30))
     
     # Application Settings
     BASE_URL = os.environ.get('BASE_URL', 'http://localhost:5000')
@@ -48,9 +75,19 @@ class Config:
     MAX_OTP_ATTEMPTS = int(os.environ.get('MAX_OTP_ATTEMPTS', 5))
     OTP_EXPIRY_MINUTES = int(os.environ.get('OTP_EXPIRY_MINUTES', 10))
     
+    # Background Tasks: off by default so serverless deploys (Vercel freezes
+    # the instance once the response is sent) run generation in the request.
+    # Enable only on long-running servers (e.g. gunicorn).
+    BACKGROUND_TASKS_ENABLED = os.environ.get('BACKGROUND_TASKS_ENABLED', 'False') == 'True'
+    BACKGROUND_WORKERS = int(os.environ.get('BACKGROUND_WORKERS', 4))
+    # Activity log inserts and key usage flushes are fire-and-forget, so they
+    # stay on their own pool even when generation runs inline
+    ACTIVITY_LOG_ASYNC = os.environ.get('ACTIVITY_LOG_ASYNC', 'True') == 'True'
+    ACTIVITY_LOG_WORKERS = int(os.environ.get('ACTIVITY_LOG_WORKERS', 4))
+    
     # File Upload Settings
     MAX_CONTENT_LENGTH = 5 * 1024 * 1024  # 5MB max file upload
-    ALLOWED_AVATAR_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    ALLOWED_AVATAR_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'gif', 'webp'})
     
     # Gemini AI (Pulled from database per user, this is a fallback only)
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
@@ -58,21 +95,23 @@ class Config:
     # Sentry (optional)
     SENTRY_DSN = os.environ.get('SENTRY_DSN')
     
+    # Environment variables that must be set (and non-empty) in production
+    REQUIRED_ENV_VARS = frozenset({
+        'SUPABASE_URL',
+        'SUPABASE_ANON_KEY',
+        'SUPABASE_SERVICE_ROLE_KEY',
+        'FERNET_SECRET_KEY'
+    })
+    
     @staticmethod
     def validate():
         """Validate required configuration variables."""
-        required = [
-            'SUPABASE_URL',
-            'SUPABASE_ANON_KEY',
-            'SUPABASE_SERVICE_ROLE_KEY',
-            'FERNET_SECRET_KEY'
-        ]
-        
-        missing = [var for var in required if not os.environ.get(var)]
+        missing = Config.REQUIRED_ENV_VARS - os.environ.keys()
+        missing |= {var for var in Config.REQUIRED_ENV_VARS - missing if not os.environ[var]}
         
         if missing:
             raise ValueError(
-                f"Missing required environment variables: {', '.join(missing)}\n"
+                f"Missing required environment variables: {', '.join(sorted(missing))}\n"
                 f"Please check your .env file or environment configuration."
             )
 
@@ -101,8 +140,8 @@ class ProductionConfig(Config):
     SESSION_COOKIE_SECURE = True
     WTF_CSRF_SSL_STRICT = True
     
-    # Strict rate limiting
-    RATELIMIT_DEFAULT = os.environ.get('RATELIMIT_DEFAULT', '5/minute')
+    # Rate limiting uses the base RATELIMIT_DEFAULT (env, falling back to
+    # 100/hour per route). Expensive routes set stricter limits themselves.
     
     @classmethod
     def init_app(cls, app):
@@ -136,8 +175,19 @@ class TestingConfig(Config):
     # Disable rate limiting for tests
     RATELIMIT_ENABLED = False
     
+    # Run background tasks inline for deterministic tests
+    BACKGROUND_TASKS_ENABLED = False
+    ACTIVITY_LOG_ASYNC = False
+    
+    # No Redis in tests: write key usage straight to the database and keep
+    # sessions in the signed cookie
+    KEY_USAGE_BUFFERED = False
+    SESSION_BACKEND = 'cookie'
+    
     # Use in-memory storage for tests
-    RATELIMIT_STORAGE_URL = 'memory://'
+    RATELIMIT_STORAGE_URI = 'memory://'
+    RATELIMIT_STORAGE_OPTIONS = {}
+    CACHE_TYPE = 'NullCache'
     
     # Override with test values
     SUPABASE_URL = os.environ.get('TEST_SUPABASE_URL', 'http://localhost:54321')
@@ -1,18 +1,190 @@
 """
 JD2Q Flask Extensions
 Centralized initialization of Flask extensions.
+
+Rate limit note: moving-window costs O(limit) per hit on Redis, so any
+per-endpoint limit above 1000 per window must use `fixed_limiter` instead.
 """
+import secrets
+from flask import current_app
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
 from flask_wtf.csrf import CSRFProtect
+from flask_caching import Cache
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from app.services.security_service import SecurityService
+
+
+def get_user_or_remote_address() -> str:
+    """
+    Rate limit key for authenticated routes.
+    
+    Returns:
+        Session user ID, falling back to the client IP when logged out
+    """
+    return SecurityService.get_session_user_id() or get_remote_address()
+
+
+_redis = None
+
+
+def get_redis():
+    """
+    Get the shared Redis client for app state (sessions, OTP codes, usage counters).
+    
+    Created on first use from REDIS_URL; one connection pool per process.
+    
+    Returns:
+        redis.Redis instance
+    """
+    global _redis
+    if _redis is None:
+        import redis
+        _redis = redis.Redis.from_url(
+            current_app.config['REDIS_URL'],
+            decode_responses=True,
+            socket_connect_timeout=1
+        )
+    return _redis
+
+
+class RedisSession(dict, SessionMixin):
+    """Server-side session; the cookie only carries its random ID."""
+    
+    def __init__(self, sid: str, data: dict = None, new: bool = False):
+        super().__init__(data or {})
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.stale_sid = None
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.modified = True
+    
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.modified = True
+    
+    def clear(self):
+        super().clear()
+        self.modified = True
+    
+    def pop(self, *args):
+        value = super().pop(*args)
+        self.modified = True
+        return value
+    
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.modified = True
+        return super().setdefault(key, default)
+    
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.modified = True
+    
+    def regenerate(self):
+        """Move the data to a fresh ID (call on login to prevent fixation)."""
+        self.stale_sid = self.stale_sid or self.sid
+        self.sid = RedisSessionInterface.generate_sid()
+        self.modified = True
+
+
+class RedisSessionInterface(SessionInterface):
+    """
+    Store session data in Redis (see get_redis) instead of a signed cookie.
+    
+    Requests skip signing and deserializing the cookie, responses carry a
+    short session ID, and logging out deletes the data server-side. Data is
+    serialized like Flask's cookie sessions, so tuples (flashes) round-trip.
+    
+    If Redis is unreachable when a session has to be written, the request
+    fails with a 500 instead of silently dropping the session.
+    """
+    
+    key_prefix = 'session:'
+    serializer = TaggedJSONSerializer()
+    
+    @staticmethod
+    def generate_sid() -> str:
+        """Random, unguessable session ID."""
+        return secrets.token_urlsafe(32)
+    
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            try:
+                data = get_redis().get(self.key_prefix + sid)
+            except Exception as e:
+                app.logger.warning(f"Session read failed: {str(e)}")
+                data = None
+            if data:
+                try:
+                    return RedisSession(sid, self.serializer.loads(data))
+                except Exception as e:
+                    app.logger.warning(f"Session data unreadable, starting a new session: {str(e)}")
+        return RedisSession(self.generate_sid(), new=True)
+    
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        
+        try:
+            r = get_redis()
+            if session.stale_sid:
+                r.delete(self.key_prefix + session.stale_sid)
+            
+            if not session:
+                if session.modified:
+                    r.delete(self.key_prefix + session.sid)
+                    response.delete_cookie(name, domain=domain, path=path)
+                return
+            
+            ttl = app.permanent_session_lifetime
+            if session.modified:
+                r.set(self.key_prefix + session.sid, self.serializer.dumps(dict(session)), ex=ttl)
+            elif self.should_set_cookie(app, session):
+                r.expire(self.key_prefix + session.sid, ttl)
+        except Exception as e:
+            # Fail the request rather than answer without the session (a
+            # login would appear to succeed and be lost on the next request)
+            app.logger.error(f"Session write failed: {str(e)}")
+            raise
+        
+        if session.modified or self.should_set_cookie(app, session):
+            response.vary.add('Cookie')
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+
 
 # CSRF Protection
 csrf = CSRFProtect()
 
+# Caching (backend configured via CACHE_* settings in app.config.Config)
+cache = Cache()
+
 # Rate Limiting
-limiter = Limiter(
+# Default limits, strategy and storage backend all come from the RATELIMIT_*
+# settings in app.config.Config.
+limiter = Limiter(key_func=get_remote_address)
+
+# Fixed-window limiter for high-volume endpoints (e.g. OTP sends): O(1) per
+# hit regardless of limit size. It overrides the configured strategy and is
+# exempt from default limits so routes aren't double counted.
+fixed_limiter = Limiter(
     key_func=get_remote_address,
-    default_limits=["100/hour"],
-    storage_uri="memory://",
-    strategy="fixed-window"
+    strategy="fixed-window",
+    key_prefix="fixed",
+    default_limits_exempt_when=lambda: True
 )
@@ -5,12 +5,28 @@ Handles OTP and OAuth authentication via Supabase.
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from app.services.supabase_service import SupabaseService, get_current_user
 from app.services.security_service import SecurityService
-from app.extensions import limiter
+from app.extensions import limiter, fixed_limiter
+from flask_limiter.util import get_remote_address
 from flask import current_app
 
 auth_bp = Blueprint('auth', __name__)
 
 
+def _display_name(user) -> str:
+    """
+    Derive a display name for a Supabase auth user.
+    
+    Args:
+        user: Supabase auth user object
+        
+    Returns:
+        Full name from user metadata, or the email's local part
+    """
+    metadata = getattr(user, 'user_metadata', None)
+    name = metadata.get('full_name') if isinstance(metadata, dict) else None
+    return name or user.email.split('@', 1)[0]
+
+
 @auth_bp.route('/login', methods=['GET'])
 def login():
     """Display login page with OTP and OAuth options."""
@@ -25,7 +41,8 @@ def login():
 
 
 @auth_bp.route('/send-otp', methods=['POST'])
-@limiter.limit("500 per minute")
+@limiter.exempt
+@fixed_limiter.limit("500 per minute", key_func=get_remote_address)
 def send_otp():
     """Send OTP email via Supabase Auth."""
     email = request.form.get('email', '').strip().lower()
@@ -80,21 +97,17 @@ def verify_otp():
         # Create or get user record
         user_record = SupabaseService.get_user(user.id)
         if not user_record:
-            display_name = user.email.split('@')[0]
-            if hasattr(user, 'user_metadata') and isinstance(user.user_metadata, dict):
-                display_name = user.user_metadata.get('full_name', display_name)
-                
             user_record = SupabaseService.create_user(
                 user_id=user.id,
                 email=user.email,
-                display_name=display_name
+                display_name=_display_name(user)
             )
         
         # Set session
         SecurityService.set_user_session(user.id, user.email, access_token)
         
         # Log activity
-        SupabaseService.log_activity(user.id, 'login', 'auth', user.id, {'method': 'otp'})
+        SupabaseService.log_activity_async(user.id, 'login', 'auth', user.id, {'method': 'otp'})
         
         # Clear OTP email from session
         session.pop('otp_email', None)
@@ -143,22 +156,17 @@ def oauth_callback():
             user_record = SupabaseService.get_user(user.id)
             
             if not user_record:
-                display_name = None
-                if hasattr(user, 'user_metadata'):
-                    if isinstance(user.user_metadata, dict):
-                        display_name = user.user_metadata.get('full_name')
-                
                 user_record = SupabaseService.create_user(
                     user_id=user.id,
                     email=user.email,
-                    display_name=display_name
+                    display_name=_display_name(user)
                 )
             
             # Set Flask session
             SecurityService.set_user_session(user.id, user.email, access_token)
             
             # Log activity
-            SupabaseService.log_activity(user.id, 'login', 'auth', user.id, {'method': 'oauth_google_pkce'})
+            SupabaseService.log_activity_async(user.id, 'login', 'auth', user.id, {'method': 'oauth_google_pkce'})
             
             flash('Successfully logged in with Google!', 'success')
             return redirect(url_for('web.dashboard'))
@@ -197,21 +205,17 @@ def set_session():
         # Create or get user record
         user_record = SupabaseService.get_user(user.id)
         if not user_record:
-            display_name = user.email.split('@')[0]
-            if hasattr(user, 'user_metadata') and isinstance(user.user_metadata, dict):
-                display_name = user.user_metadata.get('full_name', display_name)
-            
             user_record = SupabaseService.create_user(
                 user_id=user.id,
                 email=user.email,
-                display_name=display_name
+                display_name=_display_name(user)
             )
         
         # Set Flask session
         SecurityService.set_user_session(user.id, user.email, access_token)
         
         # Log activity
-        SupabaseService.log_activity(user.id, 'login', 'auth', user.id, {'method': 'oauth_google'})
+        SupabaseService.log_activity_async(user.id, 'login', 'auth', user.id, {'method': 'oauth_google'})
         
         return {'success': True, 'redirect': url_for('web.dashboard')}
         
@@ -228,7 +232,7 @@ def logout():
     
     # Log activity before logout
     if user_id:
-        SupabaseService.log_activity(user_id, 'logout', 'auth', user_id)
+        SupabaseService.log_activity_async(user_id, 'logout', 'auth', user_id)
     
     # Sign out from Supabase
     if access_token:
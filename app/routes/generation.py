@@ -2,14 +2,111 @@
 JD2Q Generation Routes
 Job description input and question generation flow.
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
-from app.services.supabase_service import login_required, SupabaseService
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, make_response, session, current_app
+from flask_wtf.csrf import generate_csrf
+from itertools import groupby
+from operator import itemgetter
+import hashlib
+from app.services.supabase_service import login_required, SupabaseService, get_current_user
 from app.services.security_service import SecurityService, validate_jd_word_count
 from app.services.ai_service import AIService, flatten_questions
-from app.extensions import limiter
+from app.services.task_service import TaskService
+from app.extensions import limiter, get_user_or_remote_address
 
 generation_bp = Blueprint('generation', __name__)
 
+# Columns rendered by generation/results.html
+RESULTS_COLUMNS = 'id, section_title, question_type, difficulty, question_text, expected_signals'
+
+
+def _results_etag(gen_request):
+    """
+    Build the ETag for a completed results page.
+    
+    Completed generations never change (regenerating creates a new one), so
+    the tag only needs to cover the per-user parts of the page: the display
+    name in the header and the CSRF secret embedded in its forms.
+    
+    Args:
+        gen_request: Completed generation request record
+        
+    Returns:
+        Hex digest ETag
+    """
+    user = get_current_user() or {}
+    # Create the CSRF secret now if this is the session's first form, so the
+    # tag matches the page rendered with it
+    generate_csrf()
+    raw = f"{gen_request['id']}:{gen_request.get('created_at')}:{user.get('display_name')}:{session.get('csrf_token', '')}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _answer_data(question):
+    """
+    Map a stored question row to the shape AIService expects for answers.
+    
+    Args:
+        question: Question record
+        
+    Returns:
+        Question data dictionary
+    """
+    return {
+        'role_level': question.get('difficulty', 'Mid-level'),
+        'skill': question.get('skill', 'General'),
+        'type': question.get('question_type', 'Conceptual'),
+        'difficulty': question.get('difficulty', 'Mid-level'),
+        'text': question.get('question_text', ''),
+        'expected_signals': question.get('expected_signals', [])
+    }
+
+
+def _run_generation(gen_id, user_id, api_key_id, job_description, encrypted_key, action, metadata):
+    """
+    Generate and store questions for a pending generation request.
+    Runs as a background task; failures are recorded on the request.
+    
+    Args:
+        gen_id: Generation request ID
+        user_id: User ID
+        api_key_id: API key ID used
+        job_description: Job description text
+        encrypted_key: Encrypted Gemini API key
+        action: Activity log action name
+        metadata: Activity log metadata (question_count is added)
+    """
+    try:
+        # Generate questions
+        result = AIService.generate_questions(
+            job_description=job_description,
+            encrypted_api_key=encrypted_key
+        )
+        
+        # Store questions before marking complete so pollers never see a partial set
+        question_count = SupabaseService.create_questions(gen_id, flatten_questions(result))
+        
+        # Update generation request with results
+        SupabaseService.update_generation_request(gen_id, {
+            'status': 'completed',
+            'role_level': result.get('role_level'),
+            'extracted_skills': result.get('extracted_skills')
+        })
+        
+        # Increment API key usage
+        SupabaseService.increment_key_usage(api_key_id)
+        
+        # Log activity
+        SupabaseService.log_activity_async(
+            user_id, action, 'generation_request', gen_id,
+            {**metadata, 'question_count': question_count}
+        )
+        
+    except Exception as e:
+        SupabaseService.update_generation_request(gen_id, {
+            'status': 'failed',
+            'error_message': str(e)
+        })
+
 
 @generation_bp.route('/', methods=['GET'])
 @login_required
@@ -29,7 +126,7 @@ def index():
 
 @generation_bp.route('/generate', methods=['POST'])
 @login_required
-@limiter.limit("5 per minute")
+@limiter.limit("5 per minute", key_func=get_user_or_remote_address)
 def generate():
     """Generate questions from job description."""
     user_id = SecurityService.get_session_user_id()
@@ -45,14 +142,15 @@ def generate():
     # Validate word count
     is_valid, word_count = validate_jd_word_count(job_description)
     if not is_valid:
-        max_words = 1500  # From config
+        max_words = current_app.config.get('MAX_JD_WORDS', 1500)
         flash(f'Job description too long ({word_count} words). Maximum is {max_words} words.', 'error')
         return redirect(url_for('generation.index'))
     
+    gen_id = None
+    
     try:
         # Get API key
-        api_keys = SupabaseService.get_api_keys(user_id)
-        selected_key = next((k for k in api_keys if k['id'] == api_key_id), None)
+        selected_key = SupabaseService.get_api_key(user_id, api_key_id)
         
         if not selected_key:
             flash('Invalid API key selected.', 'error')
@@ -67,38 +165,20 @@ def generate():
         
         gen_id = gen_request['id']
         
-        # Generate questions
-        result = AIService.generate_questions(
-            job_description=job_description,
-            encrypted_api_key=selected_key['encrypted_key']
-        )
-        
-        # Update generation request with results
-        SupabaseService.update_generation_request(gen_id, {
-            'status': 'completed',
-            'role_level': result.get('role_level'),
-            'extracted_skills': result.get('extracted_skills')
-        })
-        
-        # Store questions
-        questions = flatten_questions(result)
-        SupabaseService.create_questions(gen_id, questions)
-        
-        # Increment API key usage
-        SupabaseService.increment_key_usage(api_key_id)
-        
-        # Log activity
-        SupabaseService.log_activity(
-            user_id, 'generate_questions', 'generation_request', gen_id,
-            {'word_count': word_count, 'question_count': len(questions)}
+        # Generate in the background when enabled (results page polls for
+        # status); otherwise this runs inline and the request is final
+        future = TaskService.submit(
+            _run_generation, gen_id, user_id, api_key_id, job_description,
+            selected_key['encrypted_key'], 'generate_questions', {'word_count': word_count}
         )
         
-        flash(f'Successfully generated {len(questions)} questions!', 'success')
+        if future is not None:
+            flash('Generating questions. This page will update when they are ready.', 'info')
         return redirect(url_for('generation.results', gen_id=gen_id))
         
     except Exception as e:
         # Update request as failed
-        if 'gen_id' in locals():
+        if gen_id is not None:
             SupabaseService.update_generation_request(gen_id, {
                 'status': 'failed',
                 'error_message': str(e)
@@ -121,28 +201,73 @@ def results(gen_id):
         flash('Generation not found.', 'error')
         return redirect(url_for('web.dashboard'))
     
-    # Get questions
-    questions = SupabaseService.get_questions_for_generation(gen_id)
+    if gen_request.get('status') == 'failed':
+        flash(f"Question generation failed: {gen_request.get('error_message')}", 'error')
+        return redirect(url_for('generation.index'))
     
-    # Group by section
-    sections = {}
-    for question in questions:
-        section_title = question.get('section_title', 'General')
-        if section_title not in sections:
-            sections[section_title] = []
-        sections[section_title].append(question)
+    if gen_request.get('status') == 'pending':
+        return render_template(
+            'generation/results.html',
+            generation=gen_request,
+            sections=[],
+            total_questions=0
+        )
+    
+    # Completed results are immutable: let the browser revalidate cheaply and
+    # skip the questions fetch when nothing changed. Pages carrying flash
+    # messages are not cached so stale notices never reappear.
+    etag = None
+    if not session.get('_flashes'):
+        etag = _results_etag(gen_request)
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+            response.set_etag(etag)
+            return response
+    
+    # Get questions (stored section by section, so each section is contiguous)
+    questions = SupabaseService.get_questions_for_generation(gen_id, columns=RESULTS_COLUMNS)
+    
+    # Group by section in a single pass
+    sections = [
+        (section_title or 'General', list(section_questions))
+        for section_title, section_questions in groupby(questions, key=itemgetter('section_title'))
+    ]
     
-    return render_template(
+    response = make_response(render_template(
         'generation/results.html',
         generation=gen_request,
         sections=sections,
         total_questions=len(questions)
-    )
+    ))
+    
+    if etag:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    
+    return response
+
+
+@generation_bp.route('/status/<gen_id>')
+@login_required
+@limiter.limit("60 per minute", key_func=get_user_or_remote_address)
+def status(gen_id):
+    """Report generation status for the results page poller (AJAX endpoint)."""
+    user_id = SecurityService.get_session_user_id()
+    
+    gen_request = SupabaseService.get_generation_request(gen_id, user_id)
+    
+    if not gen_request:
+        return jsonify({'error': 'Generation not found'}), 404
+    
+    return jsonify({
+        'status': gen_request.get('status'),
+        'error_message': gen_request.get('error_message')
+    })
 
 
 @generation_bp.route('/regenerate/<gen_id>', methods=['POST'])
 @login_required
-@limiter.limit("3 per minute")
+@limiter.limit("3 per minute", key_func=get_user_or_remote_address)
 def regenerate(gen_id):
     """Regenerate questions from an existing generation request."""
     user_id = SecurityService.get_session_user_id()
@@ -157,11 +282,11 @@ def regenerate(gen_id):
     # Reuse parameters
     job_description = original_gen['job_description']
     api_key_id = original_gen['api_key_id']
+    new_gen_id = None
     
     try:
         # Get API key
-        api_keys = SupabaseService.get_api_keys(user_id)
-        selected_key = next((k for k in api_keys if k['id'] == api_key_id), None)
+        selected_key = SupabaseService.get_api_key(user_id, api_key_id)
         
         if not selected_key:
             flash('Original API key usage not authorized or key deleted.', 'error')
@@ -176,37 +301,19 @@ def regenerate(gen_id):
         
         new_gen_id = gen_request['id']
         
-        # Generate questions
-        result = AIService.generate_questions(
-            job_description=job_description,
-            encrypted_api_key=selected_key['encrypted_key']
-        )
-        
-        # Update generation request
-        SupabaseService.update_generation_request(new_gen_id, {
-            'status': 'completed',
-            'role_level': result.get('role_level'),
-            'extracted_skills': result.get('extracted_skills')
-        })
-        
-        # Store questions
-        questions = flatten_questions(result)
-        SupabaseService.create_questions(new_gen_id, questions)
-        
-        # Increment usage
-        SupabaseService.increment_key_usage(api_key_id)
-        
-        # Log activity
-        SupabaseService.log_activity(
-            user_id, 'regenerate_questions', 'generation_request', new_gen_id,
-            {'original_gen_id': gen_id, 'question_count': len(questions)}
+        # Generate in the background when enabled (results page polls for
+        # status); otherwise this runs inline and the request is final
+        future = TaskService.submit(
+            _run_generation, new_gen_id, user_id, api_key_id, job_description,
+            selected_key['encrypted_key'], 'regenerate_questions', {'original_gen_id': gen_id}
         )
         
-        flash(f'Successfully regenerated questions!', 'success')
+        if future is not None:
+            flash('Regenerating questions. This page will update when they are ready.', 'info')
         return redirect(url_for('generation.results', gen_id=new_gen_id))
         
     except Exception as e:
-        if 'new_gen_id' in locals():
+        if new_gen_id is not None:
             SupabaseService.update_generation_request(new_gen_id, {
                 'status': 'failed',
                 'error_message': str(e)
@@ -217,63 +324,88 @@ def regenerate(gen_id):
 
 @generation_bp.route('/answer/<question_id>', methods=['POST'])
 @login_required
-@limiter.limit("10 per minute")
+@limiter.limit("10 per minute", key_func=get_user_or_remote_address)
 def generate_answer(question_id):
     """Generate model answer for a question (AJAX endpoint)."""
     user_id = SecurityService.get_session_user_id()
     
     try:
-        # Get question details using list query (more reliable than maybe_single for some environments)
-        client = SupabaseService.get_client()
-        question_res = client.table('questions').select('*').eq('id', question_id).execute()
-        
-        if not question_res.data:
-            return jsonify({'error': 'Question entries not found for this ID'}), 404
+        # Get question, ownership and API key in a single round-trip
+        question_data = SupabaseService.get_answer_context(question_id, user_id)
         
-        question_data = question_res.data[0]
-        
-        # Verify ownership via generation request
-        gen_res = client.table('generation_requests').select('user_id, api_key_id').eq('id', question_data['generation_id']).execute()
-        
-        if not gen_res.data:
-            return jsonify({'error': 'Generation record missing'}), 404
-            
-        gen_data = gen_res.data[0]
-        if gen_data['user_id'] != user_id:
-            return jsonify({'error': 'Access Denied: You do not own this generation record'}), 403
+        if not question_data:
+            return jsonify({'error': 'Question not found'}), 404
         
         # Check if answer already exists
         if question_data.get('generated_answer'):
             return jsonify({'answer': question_data['generated_answer']})
         
-        # Get API key record separately for reliability
-        key_res = client.table('api_keys').select('encrypted_key').eq('id', gen_data['api_key_id']).execute()
+        encrypted_key = question_data.get('encrypted_key')
         
-        if not key_res.data:
+        if not encrypted_key:
             return jsonify({'error': 'Associated API key has been deleted or is missing'}), 404
-            
-        encrypted_key = key_res.data[0]['encrypted_key']
-        
-        # Prepare question data for answer generation
-        answer_data = {
-            'role_level': question_data.get('difficulty', 'Mid-level'),
-            'skill': question_data.get('skill', 'General'),
-            'type': question_data.get('question_type', 'Conceptual'),
-            'difficulty': question_data.get('difficulty', 'Mid-level'),
-            'text': question_data.get('question_text', ''),
-            'expected_signals': question_data.get('expected_signals', [])
-        }
         
         # Generate answer
-        answer = AIService.generate_answer(answer_data, encrypted_key)
+        answer = AIService.generate_answer(_answer_data(question_data), encrypted_key)
         
         # Save answer
         SupabaseService.update_question_answer(question_id, answer)
+        SupabaseService.invalidate_generation_cache(question_data['generation_id'], user_id)
         
         # Log activity
-        SupabaseService.log_activity(user_id, 'generate_answer', 'question', question_id)
+        SupabaseService.log_activity_async(user_id, 'generate_answer', 'question', question_id)
         
         return jsonify({'answer': answer})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+@generation_bp.route('/answers/<gen_id>', methods=['POST'])
+@login_required
+@limiter.limit("3 per minute", key_func=get_user_or_remote_address)
+def generate_answers(gen_id):
+    """Generate model answers for every unanswered question of a generation (AJAX endpoint)."""
+    user_id = SecurityService.get_session_user_id()
+    
+    try:
+        gen_request = SupabaseService.get_generation_request(gen_id, user_id)
+        
+        if not gen_request:
+            return jsonify({'error': 'Generation not found'}), 404
+        
+        selected_key = SupabaseService.get_api_key(user_id, gen_request['api_key_id'])
+        
+        if not selected_key:
+            return jsonify({'error': 'Associated API key has been deleted or is missing'}), 404
+        
+        questions = SupabaseService.get_questions_for_generation(
+            gen_id, 'id, skill, question_type, difficulty, question_text, expected_signals, generated_answer'
+        )
+        
+        answers = {q['id']: q['generated_answer'] for q in questions if q.get('generated_answer')}
+        pending = [q for q in questions if not q.get('generated_answer')]
+        
+        # Fan out the Gemini calls; they dominate the wall clock
+        generated = AIService.generate_answers_bulk(
+            [_answer_data(q) for q in pending], selected_key['encrypted_key']
+        )
+        
+        saved = 0
+        for question, answer in zip(pending, generated):
+            if answer:
+                SupabaseService.update_question_answer(question['id'], answer)
+                answers[question['id']] = answer
+                saved += 1
+        
+        if saved:
+            SupabaseService.invalidate_generation_cache(gen_id, user_id)
+            SupabaseService.log_activity_async(
+                user_id, 'generate_answers', 'generation_request', gen_id,
+                {'answer_count': saved}
+            )
+        
+        return jsonify({'answers': answers, 'failed': len(pending) - saved})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
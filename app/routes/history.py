@@ -2,16 +2,85 @@
 JD2Q History Routes
 Generation history viewing and export functionality.
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, make_response, jsonify, request
+from flask import Blueprint, render_template, redirect, url_for, flash, jsonify, request, Response, stream_with_context, send_file, make_response
 from app.services.supabase_service import login_required, SupabaseService
 from app.services.security_service import SecurityService
+from app.services.pdf_service import PDFService
+import base64
+import binascii
 import csv
+import hashlib
 import io
 import json
+import orjson
+import tempfile
 from datetime import datetime
 
 history_bp = Blueprint('history', __name__)
 
+HISTORY_PAGE_SIZE = 20
+VIEW_QUESTIONS_PAGE_SIZE = 10
+
+
+def _encode_cursor(generation):
+    """Encode a generation's (created_at, id) as an opaque pagination cursor."""
+    raw = json.dumps([generation['created_at'], generation['id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    """Decode a pagination cursor, returning None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        created_at, gen_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        # Reject tampered cursors before they reach the keyset filter
+        datetime.fromisoformat(created_at)
+        if not isinstance(gen_id, str):
+            return None
+        return created_at, gen_id
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+def _export_etag(kind, gen_request, payload):
+    """
+    Build a strong ETag for an export from the data it is rendered from.
+    
+    Exports are deterministic functions of the stored generation, so hashing
+    the source data identifies the body without buffering the stream.
+    
+    Args:
+        kind: Export format name
+        gen_request: Generation request record
+        payload: Questions or sections included in the export
+        
+    Returns:
+        Hex digest ETag
+    """
+    raw = orjson.dumps([kind, gen_request, payload], option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _not_modified(etag):
+    """Return a 304 response if the client already holds this export, else None."""
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        _set_export_cache_headers(response, etag)
+        return response
+    return None
+
+
+def _set_export_cache_headers(response, etag):
+    """
+    Mark an export as cacheable by the browser only, revalidated on each use.
+    
+    Not 'immutable': saving generated answers changes CSV/JSON/PDF content,
+    so the browser must revalidate (cheaply, via If-None-Match).
+    """
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+
 
 @history_bp.route('/')
 @login_required
@@ -19,48 +88,54 @@ def index():
     """List generation history."""
     user_id = SecurityService.get_session_user_id()
     
-    # Get pagination params
-    page = int(request.args.get('page', 1))
-    per_page = 20
-    offset = (page - 1) * per_page
+    # Get pagination cursor (seek past the last row of the previous page)
+    cursor = request.args.get('cursor')
+    after = _decode_cursor(cursor)
     
-    # Get generations
-    generations = SupabaseService.get_user_generations(user_id, limit=per_page, offset=offset)
+    # Fetch one extra row to know whether an older page exists
+    generations = SupabaseService.get_user_generations(user_id, limit=HISTORY_PAGE_SIZE + 1, after=after)
+    has_more = len(generations) > HISTORY_PAGE_SIZE
+    generations = generations[:HISTORY_PAGE_SIZE]
+    next_cursor = _encode_cursor(generations[-1]) if has_more else None
     
-    return render_template('history/index.html', generations=generations, page=page)
+    return render_template(
+        'history/index.html',
+        generations=generations,
+        next_cursor=next_cursor,
+        is_first_page=after is None
+    )
 
 
 @history_bp.route('/<gen_id>')
 @login_required
 def view(gen_id):
-    """View specific generation with all questions."""
+    """View a generation one section (and page of questions) at a time."""
     user_id = SecurityService.get_session_user_id()
     
-    gen_request = SupabaseService.get_generation_request(gen_id, user_id)
+    gen_request, sections = SupabaseService.get_generation_sections(gen_id, user_id)
     
     if not gen_request:
         flash('Generation not found.', 'error')
         return redirect(url_for('history.index'))
     
-    questions = SupabaseService.get_questions_for_generation(gen_id)
+    # Selected section tab and page within it (out-of-range values are clamped)
+    section_index = min(max(request.args.get('section', 0, type=int), 0), max(len(sections) - 1, 0))
+    section = sections[section_index] if sections else {'title': None, 'questions': []}
     
-    # Group by section
-    sections = {}
-    for question in questions:
-        section_title = question.get('section_title', 'General')
-        if section_title not in sections:
-            sections[section_title] = {
-                'title': section_title,
-                'skill': question.get('skill'),
-                'questions': []
-            }
-        sections[section_title]['questions'].append(question)
+    page_count = max(-(-len(section['questions']) // VIEW_QUESTIONS_PAGE_SIZE), 1)
+    page = min(max(request.args.get('page', 1, type=int), 1), page_count)
+    start = (page - 1) * VIEW_QUESTIONS_PAGE_SIZE
     
     return render_template(
         'history/view.html',
         generation=gen_request,
-        sections=sections.values(),
-        total_questions=len(questions)
+        sections=sections,
+        section_index=section_index,
+        section=section,
+        questions=section['questions'][start:start + VIEW_QUESTIONS_PAGE_SIZE],
+        page=page,
+        page_count=page_count,
+        total_questions=sum(len(s['questions']) for s in sections)
     )
 
 
@@ -70,30 +145,46 @@ def export_json(gen_id):
     """Export questions as JSON."""
     user_id = SecurityService.get_session_user_id()
     
-    gen_request = SupabaseService.get_generation_request(gen_id, user_id)
+    gen_request, questions = SupabaseService.get_generation_with_questions(gen_id, user_id)
     
     if not gen_request:
         return jsonify({'error': 'Generation not found'}), 404
     
-    questions = SupabaseService.get_questions_for_generation(gen_id)
+    etag = _export_etag('json', gen_request, questions)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
     
-    # Build export structure
-    export_data = {
+    # Export header (everything except the questions list)
+    export_header = {
         'generation_id': gen_id,
         'created_at': gen_request.get('created_at'),
         'role_level': gen_request.get('role_level'),
         'extracted_skills': gen_request.get('extracted_skills'),
-        'job_description': gen_request.get('job_description'),
-        'questions': questions
+        'job_description': gen_request.get('job_description')
     }
     
-    # Create response
-    response = make_response(json.dumps(export_data, indent=2))
-    response.headers['Content-Type'] = 'application/json'
+    def generate():
+        """Yield the export document incrementally, one question at a time."""
+        yield b'{\n'
+        for key, value in export_header.items():
+            yield b'  ' + orjson.dumps(key) + b': ' + orjson.dumps(value) + b',\n'
+        yield b'  "questions": ['
+        
+        separator = b'\n    '
+        for question in questions:
+            yield separator + orjson.dumps(question)
+            separator = b',\n    '
+        
+        yield b'\n  ]\n}\n'
+    
+    # Create streaming response
+    response = Response(stream_with_context(generate()), mimetype='application/json')
     response.headers['Content-Disposition'] = f'attachment; filename=questions_{gen_id}.json'
+    _set_export_cache_headers(response, etag)
     
     # Log activity
-    SupabaseService.log_activity(user_id, 'export_json', 'generation_request', gen_id)
+    SupabaseService.log_activity_async(user_id, 'export_json', 'generation_request', gen_id)
     
     return response
 
@@ -104,44 +195,56 @@ def export_csv(gen_id):
     """Export questions as CSV."""
     user_id = SecurityService.get_session_user_id()
     
-    gen_request = SupabaseService.get_generation_request(gen_id, user_id)
+    gen_request, questions = SupabaseService.get_generation_with_questions(gen_id, user_id)
     
     if not gen_request:
         flash('Generation not found.', 'error')
         return redirect(url_for('history.index'))
     
-    questions = SupabaseService.get_questions_for_generation(gen_id)
-    
-    # Create CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
+    etag = _export_etag('csv', gen_request, questions)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
     
-    # Header
-    writer.writerow([
-        'Question ID', 'Section', 'Skill', 'Type', 'Difficulty',
-        'Question', 'Expected Signals', 'Model Answer'
-    ])
-    
-    # Rows
-    for q in questions:
+    def generate():
+        """Yield the CSV one row at a time, reusing a single line buffer."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        
+        def flush():
+            line = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            return line
+        
+        # Header
         writer.writerow([
-            q.get('question_id', ''),
-            q.get('section_title', ''),
-            q.get('skill', ''),
-            q.get('question_type', ''),
-            q.get('difficulty', ''),
-            q.get('question_text', ''),
-            ', '.join(q.get('expected_signals', [])),
-            q.get('generated_answer', '')
+            'Question ID', 'Section', 'Skill', 'Type', 'Difficulty',
+            'Question', 'Expected Signals', 'Model Answer'
         ])
+        yield flush()
+        
+        # Rows
+        for q in questions:
+            writer.writerow([
+                q.get('question_id', ''),
+                q.get('section_title', ''),
+                q.get('skill', ''),
+                q.get('question_type', ''),
+                q.get('difficulty', ''),
+                q.get('question_text', ''),
+                ', '.join(q.get('expected_signals', [])),
+                q.get('generated_answer', '')
+            ])
+            yield flush()
     
-    # Create response
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
+    # Create streaming response
+    response = Response(stream_with_context(generate()), mimetype='text/csv')
     response.headers['Content-Disposition'] = f'attachment; filename=questions_{gen_id}.csv'
+    _set_export_cache_headers(response, etag)
     
     # Log activity
-    SupabaseService.log_activity(user_id, 'export_csv', 'generation_request', gen_id)
+    SupabaseService.log_activity_async(user_id, 'export_csv', 'generation_request', gen_id)
     
     return response
 
@@ -149,33 +252,34 @@ def export_csv(gen_id):
 @history_bp.route('/<gen_id>/export/pdf')
 @login_required
 def export_pdf(gen_id):
-    """Export questions as PDF."""
-    # Note: For simplicity, we'll redirect to a print-friendly page
-    # In production, you'd use reportlab or weasyprint
+    """Export questions as a server-rendered PDF."""
     user_id = SecurityService.get_session_user_id()
     
-    gen_request = SupabaseService.get_generation_request(gen_id, user_id)
+    gen_request, sections = SupabaseService.get_generation_sections(gen_id, user_id)
     
     if not gen_request:
         flash('Generation not found.', 'error')
         return redirect(url_for('history.index'))
     
-    questions = SupabaseService.get_questions_for_generation(gen_id)
+    etag = _export_etag('pdf', gen_request, sections)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
     
-    # Group by section
-    sections = {}
-    for question in questions:
-        section_title = question.get('section_title', 'General')
-        if section_title not in sections:
-            sections[section_title] = []
-        sections[section_title].append(question)
+    # Render into memory, spilling to disk for unusually large sheets
+    buffer = tempfile.SpooledTemporaryFile(max_size=2 << 20)
+    PDFService.build_generation_pdf(gen_request, sections, buffer)
+    buffer.seek(0)
     
     # Log activity
-    SupabaseService.log_activity(user_id, 'export_pdf', 'generation_request', gen_id)
+    SupabaseService.log_activity_async(user_id, 'export_pdf', 'generation_request', gen_id)
     
-    return render_template(
-        'history/print.html',
-        generation=gen_request,
-        sections=sections,
-        total_questions=len(questions)
+    response = send_file(
+        buffer,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f'questions_{gen_id}.pdf'
     )
+    _set_export_cache_headers(response, etag)
+    
+    return response
@@ -2,8 +2,8 @@
 JD2Q Profile Routes
 User profile management and API key CRUD.
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
-from app.services.supabase_service import login_required, SupabaseService, get_current_user
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
+from app.services.supabase_service import login_required, SupabaseService, get_current_user, invalidate_current_user
 from app.services.security_service import SecurityService
 from app.services.ai_service import AIService
 from werkzeug.utils import secure_filename
@@ -35,8 +35,9 @@ def edit():
     try:
         user_id = SecurityService.get_session_user_id()
         SupabaseService.update_user(user_id, {'display_name': display_name})
+        invalidate_current_user()
         
-        SupabaseService.log_activity(user_id, 'update_profile', 'user', user_id)
+        SupabaseService.log_activity_async(user_id, 'update_profile', 'user', user_id)
         
         flash('Profile updated successfully!', 'success')
         return redirect(url_for('profile.view'))
@@ -53,8 +54,12 @@ def keys():
     user_id = SecurityService.get_session_user_id()
     api_keys = SupabaseService.get_api_keys(user_id)
     
+    # Counts flush in batches; add what is still buffered so totals are current
+    pending = SupabaseService.get_pending_key_usage([key['id'] for key in api_keys])
+    
     # Mask keys for display
     for key in api_keys:
+        key['usage_count'] = (key.get('usage_count') or 0) + pending.get(key['id'], 0)
         key['masked_key'] = SecurityService.mask_api_key(key['encrypted_key'], visible_chars=8)
     
     return render_template('profile/keys.html', api_keys=api_keys)
@@ -87,7 +92,7 @@ def add_key():
         # Create encrypted key
         SupabaseService.create_api_key(user_id, key_name, api_key)
         
-        SupabaseService.log_activity(user_id, 'create_api_key', 'api_key', None, {'key_name': key_name})
+        SupabaseService.log_activity_async(user_id, 'create_api_key', 'api_key', None, {'key_name': key_name})
         
         flash('API key added successfully!', 'success')
         return redirect(url_for('profile.keys'))
@@ -103,14 +108,31 @@ def delete_key(key_id):
     """Delete API key."""
     user_id = SecurityService.get_session_user_id()
     
+    # Look the key up before deleting it so this worker can drop its cached
+    # Gemini models afterwards (best effort; other workers evict by LRU)
+    try:
+        encrypted_key = (SupabaseService.get_api_key(user_id, key_id) or {}).get('encrypted_key')
+    except Exception as e:
+        current_app.logger.warning(f"API key lookup before delete failed: {str(e)}")
+        encrypted_key = None
+    
     try:
         SupabaseService.delete_api_key(key_id, user_id)
         
-        SupabaseService.log_activity(user_id, 'delete_api_key', 'api_key', key_id)
+        SupabaseService.log_activity_async(user_id, 'delete_api_key', 'api_key', key_id)
         
         flash('API key deleted successfully.', 'success')
     except Exception as e:
         flash(f'Failed to delete API key: {str(e)}', 'error')
+        return redirect(url_for('profile.keys'))
+    
+    if encrypted_key:
+        try:
+            plaintext = SecurityService.decrypt_api_key_cached(encrypted_key)
+            if plaintext:
+                AIService.evict_key(plaintext.strip())
+        except Exception as e:
+            current_app.logger.warning(f"Cached model eviction failed: {str(e)}")
     
     return redirect(url_for('profile.keys'))
 
@@ -1,11 +1,15 @@
 """Services package initialization."""
 from app.services.security_service import SecurityService, OTPService, validate_jd_word_count
 from app.services.supabase_service import SupabaseService, get_current_user, login_required
+from app.services.task_service import TaskService
+from app.services.pdf_service import PDFService
 
 __all__ = [
     'SecurityService',
     'OTPService',
+    'PDFService',
     'SupabaseService',
+    'TaskService',
     'get_current_user',
     'login_required',
     'validate_jd_word_count'
@@ -1,61 +1,257 @@
 """
 JD2Q AI Service
 Google Gemini API integration for question and answer generation.
+
+The google.generativeai SDK is imported lazily inside the methods that use
+it; it is the slowest import in the app and would otherwise be pulled in by
+every route module at app creation.
 """
-import json
+import functools
+import hashlib
+import orjson
 import os
-from typing import Dict, List, Any, Optional
+import re
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, List, Any, Mapping, Optional, Tuple
 from flask import current_app
-import google.generativeai as genai
 from app.services.security_service import SecurityService
 
-print("\n" + "="*50)
-print("DEBUG: JD2Q AI Service Loaded Successfully")
-print("="*50 + "\n")
+# Matches {{placeholder}} markers in prompt user templates
+PLACEHOLDER_RE = re.compile(r'\{\{(\w+)\}\}')
+
+
+@functools.lru_cache(maxsize=16)
+def _load_template(template_name: str) -> Mapping[str, Any]:
+    """
+    Read and parse a prompt template file (cached per template name).
+    
+    Args:
+        template_name: Template file name (without .json extension)
+        
+    Returns:
+        Read-only view of the prompt template, shared by every caller
+    """
+    template_path = os.path.join(AIService._prompts_dir(), f'{template_name}.json')
+    
+    with open(template_path, 'rb') as f:
+        template = orjson.loads(f.read())
+    
+    # Pre-split into alternating literal/placeholder parts for render_prompt
+    template['user_template_parts'] = tuple(PLACEHOLDER_RE.split(template['user_template']))
+    
+    return MappingProxyType(template)
+
+
+@functools.lru_cache(maxsize=16)
+def _required_fields(template_name: str) -> Tuple[frozenset, frozenset]:
+    """
+    Required response and question fields from a template's response_schema.
+    
+    Compiled once per template so validation stays in step with the schema
+    without walking it on every response.
+    
+    Args:
+        template_name: Template file name (without .json extension)
+        
+    Returns:
+        Tuple of (response fields, question fields)
+    """
+    schema = _load_template(template_name)['response_schema']
+    question_schema = schema['properties']['sections']['items']['properties']['questions']['items']
+    return frozenset(schema['required']), frozenset(question_schema['required'])
 
 
 class AIService:
     """Service for interacting with Google Gemini API."""
     
-    # Cache for prompt templates
-    _prompts_cache = {}
+    # LRU of GenerativeModel instances per key (each keeps the connection it
+    # was first bound to), keyed by key hash
+    _models_cache = OrderedDict()
+    _models_lock = threading.Lock()
+    MODELS_CACHE_SIZE = 64
+    
+    # Serializes genai.configure() with the request that binds a new model
+    _configure_lock = threading.Lock()
+    
+    # Concurrent Gemini calls per bulk answer request
+    ANSWER_WORKERS = 8
+    
+    ANSWER_GENERATION_CONFIG = {
+        'temperature': 0.8,
+        'top_p': 0.95,
+        'max_output_tokens': 1024
+    }
     
     @staticmethod
-    def load_prompt_template(template_name: str) -> Dict[str, Any]:
+    def _prompts_dir() -> str:
+        """Get the absolute path of the prompts directory."""
+        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+        return os.path.join(base_dir, 'prompts')
+    
+    @staticmethod
+    def preload_templates():
         """
-        Load prompt template from JSON file.
+        Load every prompt template into the cache.
+        
+        Called from the app factory so generation requests never touch disk.
+        """
+        prompts_dir = AIService._prompts_dir()
+        for filename in os.listdir(prompts_dir):
+            if filename.endswith('.json'):
+                AIService.load_prompt_template(filename[:-len('.json')])
+    
+    @staticmethod
+    def load_prompt_template(template_name: str) -> Mapping[str, Any]:
+        """
+        Load prompt template from JSON file, parsed once per process.
         
         Args:
             template_name: Template file name (without .json extension)
             
         Returns:
-            Prompt template dictionary
+            Read-only prompt template mapping
         """
-        if template_name in AIService._prompts_cache:
-            return AIService._prompts_cache[template_name]
-        
-        # Get prompts directory
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        prompts_dir = os.path.join(base_dir, 'prompts')
-        template_path = os.path.join(prompts_dir, f'{template_name}.json')
+        return _load_template(template_name)
+    
+    @staticmethod
+    def clear_template_cache():
+        """Drop parsed templates so the next load rereads them from disk."""
+        _load_template.cache_clear()
+        _required_fields.cache_clear()
+    
+    @staticmethod
+    def render_prompt(template: Mapping[str, Any], values: Dict[str, str]) -> str:
+        """
+        Fill a template's {{placeholder}} markers in a single pass.
         
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template = json.load(f)
+        Substituted values are never rescanned, and unknown placeholders are
+        left as-is.
         
-        AIService._prompts_cache[template_name] = template
-        return template
+        Args:
+            template: Prompt template loaded by load_prompt_template
+            values: Placeholder name to replacement text
+            
+        Returns:
+            Rendered prompt text
+        """
+        parts = template['user_template_parts']
+        return ''.join(
+            values.get(part, f'{{{{{part}}}}}') if i % 2 else part
+            for i, part in enumerate(parts)
+        )
     
     @staticmethod
     def configure_client(api_key: str):
         """
         Configure Gemini client with API key.
         
+        Changes process-wide SDK state; callers must hold _configure_lock.
+        
         Args:
             api_key: Decrypted Gemini API key
         """
+        import google.generativeai as genai
+        
         if api_key:
             genai.configure(api_key=api_key.strip())
     
+    @staticmethod
+    def get_model(api_key: str, model_name: str, template_name: Optional[str] = None):
+        """
+        Get the cached GenerativeModel for the given API key.
+        
+        The cache is keyed by a hash of the key so plaintext keys never appear
+        in cache keys. Use generate_content() to call the model, which binds it
+        to this key on first use.
+        
+        Args:
+            api_key: Plaintext Gemini API key
+            model_name: Gemini model name
+            template_name: Prompt template providing the system instruction
+            
+        Returns:
+            Tuple of (genai.GenerativeModel, threading.Event set once bound)
+        """
+        key_hash = hashlib.blake2b(api_key.encode(), digest_size=16).digest()
+        model_key = (model_name, template_name)
+        
+        with AIService._models_lock:
+            models = AIService._models_cache.get(key_hash)
+            if models is not None:
+                AIService._models_cache.move_to_end(key_hash)
+                cached = models.get(model_key)
+                if cached is not None:
+                    return cached
+        
+        import google.generativeai as genai
+        
+        system_instruction = None
+        if template_name:
+            system_instruction = AIService.load_prompt_template(template_name)['system_instruction']
+        
+        model = genai.GenerativeModel(
+            model_name=model_name,
+            system_instruction=system_instruction
+        )
+        
+        with AIService._models_lock:
+            models = AIService._models_cache.setdefault(key_hash, {})
+            AIService._models_cache.move_to_end(key_hash)
+            cached = models.setdefault(model_key, (model, threading.Event()))
+            while len(AIService._models_cache) > AIService.MODELS_CACHE_SIZE:
+                AIService._models_cache.popitem(last=False)
+        
+        return cached
+    
+    @staticmethod
+    def evict_key(api_key: str):
+        """
+        Drop cached models for an API key so their connections can close.
+        
+        Called when a key is deleted; the cache otherwise only evicts by LRU.
+        
+        Args:
+            api_key: Plaintext Gemini API key
+        """
+        key_hash = hashlib.blake2b(api_key.encode(), digest_size=16).digest()
+        with AIService._models_lock:
+            AIService._models_cache.pop(key_hash, None)
+    
+    @staticmethod
+    def generate_content(api_key: str, model_name: str, template_name: Optional[str],
+                         contents: Any, **kwargs):
+        """
+        Call generate_content on the cached model for the given API key.
+        
+        The SDK binds a model to the process-wide client on its first request,
+        so that request runs under _configure_lock right after configuring
+        this key. Later requests reuse the model's own client without locking,
+        so concurrent requests with different keys cannot cross over.
+        
+        Args:
+            api_key: Plaintext Gemini API key
+            model_name: Gemini model name
+            template_name: Prompt template providing the system instruction
+            contents: Prompt contents
+            **kwargs: Passed through to GenerativeModel.generate_content
+            
+        Returns:
+            GenerateContentResponse
+        """
+        model, bound = AIService.get_model(api_key, model_name, template_name)
+        
+        if not bound.is_set():
+            with AIService._configure_lock:
+                if not bound.is_set():
+                    AIService.configure_client(api_key)
+                    response = model.generate_content(contents, **kwargs)
+                    bound.set()
+                    return response
+        
+        return model.generate_content(contents, **kwargs)
+    
     @staticmethod
     def generate_questions(job_description: str, encrypted_api_key: str) -> Dict[str, Any]:
         """
@@ -73,39 +269,30 @@ class AIService:
         """
         try:
             # Decrypt API key
-            api_key = SecurityService.decrypt_api_key(encrypted_api_key)
+            api_key = SecurityService.decrypt_api_key_cached(encrypted_api_key)
             if not api_key:
                 raise Exception("Decrypted API key is EMPTY")
             
             api_key = api_key.strip()
             key_prefix = api_key[:5] + "..." + api_key[-4:] if len(api_key) > 10 else "SHORT"
             
-            # CRITICAL LOGGING FOR DEBUGGING
-            print(f"\n[AI SERVICE] Generating questions...")
-            print(f"[AI SERVICE] Model: models/gemini-2.5-flash")
-            print(f"[AI SERVICE] Using Key: {key_prefix}")
-            
-            AIService.configure_client(api_key)
+            current_app.logger.debug(
+                "Generating questions model=%s key=%s", 'models/gemini-2.5-flash', key_prefix
+            )
             
             # Load prompt template
             template = AIService.load_prompt_template('v1_structured')
             
             # Build prompt
             min_questions = current_app.config.get('MIN_QUESTIONS', 15)
-            user_prompt = template['user_template'].replace(
-                '{{job_description}}', job_description
-            ).replace(
-                '{{min_questions}}', str(min_questions)
-            )
-            
-            # Configure model
-            model = genai.GenerativeModel(
-                model_name='models/gemini-2.5-flash',
-                system_instruction=template['system_instruction']
-            )
+            user_prompt = AIService.render_prompt(template, {
+                'job_description': job_description,
+                'min_questions': str(min_questions)
+            })
             
             # Generate content
-            response = model.generate_content(
+            response = AIService.generate_content(
+                api_key, 'models/gemini-2.5-flash', 'v1_structured',
                 user_prompt,
                 generation_config={
                     'temperature': 0.7,
@@ -117,14 +304,14 @@ class AIService:
             )
             
             # Parse response
-            result = json.loads(response.text)
+            result = orjson.loads(response.text)
             
             # Validate schema
             AIService._validate_question_response(result, min_questions)
             
             return result
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             raise Exception(f"Failed to parse AI response as JSON: {str(e)}")
         except Exception as e:
             # Include key prefix to diagnose if it's the right key
@@ -151,40 +338,15 @@ class AIService:
         """
         try:
             # Decrypt API key
-            api_key = SecurityService.decrypt_api_key(encrypted_api_key)
-            AIService.configure_client(api_key)
+            api_key = (SecurityService.decrypt_api_key_cached(encrypted_api_key) or '').strip()
             
-            # Load prompt template
-            template = AIService.load_prompt_template('answer_template')
-            
-            # Build prompt
-            user_prompt = template['user_template']
-            replacements = {
-                '{{role_level}}': question_data.get('role_level', 'Mid-level'),
-                '{{skill}}': question_data.get('skill', 'General'),
-                '{{question_type}}': question_data.get('type', 'Conceptual'),
-                '{{difficulty}}': question_data.get('difficulty', 'Mid-level'),
-                '{{question_text}}': question_data.get('text', ''),
-                '{{expected_signals}}': '\n'.join(f"- {signal}" for signal in question_data.get('expected_signals', []))
-            }
-            
-            for placeholder, value in replacements.items():
-                user_prompt = user_prompt.replace(placeholder, value)
-            
-            # Configure model
-            model = genai.GenerativeModel(
-                model_name='models/gemini-2.5-flash',
-                system_instruction=template['system_instruction']
-            )
+            user_prompt = AIService._build_answer_prompt(question_data)
             
             # Generate content
-            response = model.generate_content(
+            response = AIService.generate_content(
+                api_key, 'models/gemini-2.5-flash', 'answer_template',
                 user_prompt,
-                generation_config={
-                    'temperature': 0.8,
-                    'top_p': 0.95,
-                    'max_output_tokens': 1024
-                }
+                generation_config=AIService.ANSWER_GENERATION_CONFIG
             )
             
             return response.text.strip()
@@ -192,6 +354,74 @@ class AIService:
         except Exception as e:
             raise Exception(f"Answer generation failed (gemini-2.5-flash): {str(e)}")
     
+    @staticmethod
+    def generate_answers_bulk(questions: List[Dict[str, Any]], encrypted_api_key: str) -> List[Optional[str]]:
+        """
+        Generate model answers for several questions concurrently.
+        
+        The key is decrypted and the model built once; the Gemini calls are
+        I/O-bound, so they are fanned out over a bounded thread pool.
+        
+        Args:
+            questions: List of question dictionaries (same shape as generate_answer)
+            encrypted_api_key: Encrypted Gemini API key
+            
+        Returns:
+            List of answers in input order; None where generation failed
+            
+        Raises:
+            Exception: If the API key cannot be decrypted
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        if not questions:
+            return []
+        
+        api_key = (SecurityService.decrypt_api_key_cached(encrypted_api_key) or '').strip()
+        if not api_key:
+            raise Exception("Answer generation failed: API key could not be decrypted")
+        
+        prompts = [AIService._build_answer_prompt(q) for q in questions]
+        # Worker threads have no app context, so bind the logger up front
+        logger = current_app.logger
+        
+        def answer(prompt):
+            try:
+                response = AIService.generate_content(
+                    api_key, 'models/gemini-2.5-flash', 'answer_template',
+                    prompt,
+                    generation_config=AIService.ANSWER_GENERATION_CONFIG
+                )
+                return response.text.strip()
+            except Exception as e:
+                logger.error(f"Bulk answer generation failed: {str(e)}")
+                return None
+        
+        with ThreadPoolExecutor(max_workers=min(AIService.ANSWER_WORKERS, len(prompts))) as executor:
+            return list(executor.map(answer, prompts))
+    
+    @staticmethod
+    def _build_answer_prompt(question_data: Dict[str, Any]) -> str:
+        """
+        Build the answer prompt for a question.
+        
+        Args:
+            question_data: Dictionary with question details
+            
+        Returns:
+            Prompt text
+        """
+        template = AIService.load_prompt_template('answer_template')
+        
+        return AIService.render_prompt(template, {
+            'role_level': question_data.get('role_level', 'Mid-level'),
+            'skill': question_data.get('skill', 'General'),
+            'question_type': question_data.get('type', 'Conceptual'),
+            'difficulty': question_data.get('difficulty', 'Mid-level'),
+            'question_text': question_data.get('text', ''),
+            'expected_signals': '\n'.join(f"- {signal}" for signal in question_data.get('expected_signals', []))
+        })
+    
     @staticmethod
     def _validate_question_response(response: Dict[str, Any], min_questions: int):
         """
@@ -204,34 +434,34 @@ class AIService:
         Raises:
             ValueError: If validation fails
         """
+        response_fields, question_fields = _required_fields('v1_structured')
+        
         # Check required fields
-        required_fields = ['role_level', 'extracted_skills', 'sections']
-        for field in required_fields:
-            if field not in response:
-                raise ValueError(f"Missing required field: {field}")
+        missing = response_fields - response.keys()
+        if missing:
+            raise ValueError(f"Missing required field: {', '.join(sorted(missing))}")
         
         # Validate sections structure
-        if not isinstance(response['sections'], list) or len(response['sections']) == 0:
+        sections = response['sections']
+        if not isinstance(sections, list) or len(sections) == 0:
             raise ValueError("Response must contain at least one section")
         
-        # Count total questions
+        # Validate each section and question, counting questions on the way
         total_questions = 0
-        for section in response['sections']:
-            if 'questions' not in section:
+        for section in sections:
+            questions = section.get('questions')
+            if questions is None:
                 raise ValueError(f"Section '{section.get('title', 'Unknown')}' missing questions")
             
-            questions = section['questions']
             if not isinstance(questions, list):
                 raise ValueError(f"Questions must be a list in section '{section.get('title', 'Unknown')}'")
             
-            total_questions += len(questions)
-            
-            # Validate each question
             for question in questions:
-                required_q_fields = ['id', 'type', 'difficulty', 'text', 'expected_signals']
-                for field in required_q_fields:
-                    if field not in question:
-                        raise ValueError(f"Question missing required field: {field}")
+                missing = question_fields - question.keys()
+                if missing:
+                    raise ValueError(f"Question missing required field: {', '.join(sorted(missing))}")
+            
+            total_questions += len(questions)
         
         # Check minimum questions
         if total_questions < 1:
@@ -249,6 +479,46 @@ class AIService:
     
     @staticmethod
     def test_api_key(api_key: str) -> tuple[bool, str]:
+        """
+        Test if an API key is valid, reusing a recent successful probe.
+        
+        The "test" button and the add-key form submit usually probe the same
+        key seconds apart, so valid results are cached briefly under a hash of
+        the key. Failures are not cached so a fixed key can be retried at once.
+        
+        Args:
+            api_key: Plaintext API key to test
+            
+        Returns:
+            Tuple of (is_valid, error_message)
+        """
+        from app.extensions import cache
+        
+        key_hash = hashlib.sha256((api_key or '').strip().encode()).hexdigest()
+        cache_key = f'key_probe:{key_hash}'
+        
+        try:
+            cached = cache.get(cache_key)
+        except Exception as e:
+            current_app.logger.warning(f"Key probe cache read failed: {str(e)}")
+            cached = None
+        
+        if cached:
+            return tuple(cached)
+        
+        is_valid, error_msg = AIService._probe_api_key(api_key)
+        
+        if is_valid:
+            try:
+                cache.set(cache_key, (is_valid, error_msg),
+                          timeout=current_app.config.get('API_KEY_PROBE_CACHE_SECONDS', 120))
+            except Exception as e:
+                current_app.logger.warning(f"Key probe cache write failed: {str(e)}")
+        
+        return is_valid, error_msg
+    
+    @staticmethod
+    def _probe_api_key(api_key: str) -> tuple[bool, str]:
         """
         Test if an API key is valid by making a simple request.
         
@@ -263,13 +533,10 @@ class AIService:
             if not api_key or len(api_key) < 10:
                 return False, "Malformed API key"
 
-            AIService.configure_client(api_key)
-            
             # Use gemini-2.5-flash as the standard probe model (best for free tier)
-            model = genai.GenerativeModel('models/gemini-2.5-flash')
-            
             # Simple probe
-            response = model.generate_content(
+            response = AIService.generate_content(
+                api_key.strip(), 'models/gemini-2.5-flash', None,
                 "Say 'ok'.",
                 generation_config={
                     'max_output_tokens': 10,
@@ -311,27 +578,28 @@ def flatten_questions(result: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
     Flatten nested question structure for easier database storage.
     
+    Expects a response that passed _validate_question_response (as returned
+    by generate_questions), so required keys are subscripted directly and a
+    malformed result raises instead of producing empty fields. Section
+    title and skill are optional.
+    
     Args:
         result: Structured response from AI
         
     Returns:
         List of question dictionaries with section info
     """
-    questions = []
-    
-    for section in result.get('sections', []):
-        section_title = section.get('title')
-        section_skill = section.get('skill')
-        
-        for question in section.get('questions', []):
-            questions.append({
-                'id': question.get('id'),
-                'section_title': section_title,
-                'skill': section_skill,
-                'type': question.get('type'),
-                'difficulty': question.get('difficulty'),
-                'text': question.get('text'),
-                'expected_signals': question.get('expected_signals', [])
-            })
-    
-    return questions
+    return [
+        {
+            'id': question['id'],
+            'section_title': section_title,
+            'skill': section_skill,
+            'type': question['type'],
+            'difficulty': question['difficulty'],
+            'text': question['text'],
+            'expected_signals': question['expected_signals'] or []
+        }
+        for section in result['sections']
+        for section_title, section_skill in ((section.get('title'), section.get('skill')),)
+        for question in section['questions']
+    ]
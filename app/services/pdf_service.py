@@ -0,0 +1,83 @@
+"""
+JD2Q PDF Service
+Server-side rendering of interview question sheets.
+
+reportlab is imported lazily; it is only needed by the PDF export route.
+"""
+from typing import Any, BinaryIO, Dict, List
+from xml.sax.saxutils import escape
+
+
+class PDFService:
+    """Builds printable interview sheets as PDF documents."""
+    
+    @staticmethod
+    def build_generation_pdf(generation: Dict[str, Any], sections: List[Dict[str, Any]], target: BinaryIO):
+        """
+        Render a generation's questions as an interview sheet PDF.
+        
+        Args:
+            generation: Generation request record
+            sections: Sections with 'title' and 'questions' (see get_generation_sections)
+            target: Binary file-like object the PDF is written to
+        """
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+        from reportlab.lib.units import mm
+        from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+        
+        styles = getSampleStyleSheet()
+        label = ParagraphStyle('Label', parent=styles['Normal'], fontSize=7, leading=9,
+                               textColor=colors.grey, fontName='Helvetica-Bold')
+        context = ParagraphStyle('Context', parent=styles['Normal'], fontSize=9, leading=12,
+                                 textColor=colors.HexColor('#4b5563'), fontName='Helvetica-Oblique')
+        question_style = ParagraphStyle('Question', parent=styles['Normal'], fontSize=11, leading=15,
+                                        fontName='Helvetica-Bold', spaceAfter=4)
+        signal_style = ParagraphStyle('Signal', parent=styles['Normal'], fontSize=9, leading=12,
+                                      leftIndent=8)
+        
+        doc = SimpleDocTemplate(
+            target, pagesize=A4,
+            leftMargin=18 * mm, rightMargin=18 * mm, topMargin=18 * mm, bottomMargin=18 * mm,
+            title='Interview Question Sheet', author='JD2Q'
+        )
+        
+        job_description = generation.get('job_description') or ''
+        story = [
+            Paragraph('Interview Question Sheet', styles['Title']),
+            Paragraph(f"Role Level: <b>{escape(generation.get('role_level') or 'N/A')}</b>", styles['Normal']),
+            Paragraph(f"Date: {escape((generation.get('created_at') or '')[:10])}", styles['Normal']),
+            Spacer(1, 6 * mm),
+            Paragraph('JOB DESCRIPTION CONTEXT', label),
+            Paragraph(f'"{escape(job_description[:500])}..."', context),
+            Spacer(1, 8 * mm),
+        ]
+        
+        notes_box = TableStyle([
+            ('BOX', (0, 0), (-1, -1), 0.5, colors.HexColor('#d1d5db')),
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f9fafb')),
+        ])
+        
+        for index, section in enumerate(sections):
+            if index:
+                story.append(PageBreak())
+            story.append(Paragraph(escape(section.get('title') or 'General'), styles['Heading2']))
+            
+            for q in section.get('questions', []):
+                story.append(Paragraph(
+                    f"{escape((q.get('question_type') or '').upper())} &bull; {escape((q.get('difficulty') or '').upper())}",
+                    label
+                ))
+                story.append(Paragraph(escape(q.get('question_text') or ''), question_style))
+                
+                story.append(Paragraph('EVALUATION SIGNALS', label))
+                for signal in q.get('expected_signals') or []:
+                    story.append(Paragraph(f'&bull; {escape(str(signal))}', signal_style))
+                
+                story.append(Spacer(1, 3 * mm))
+                story.append(Paragraph('INTERVIEW NOTES', label))
+                story.append(Table([['']], colWidths=[doc.width], rowHeights=[28 * mm], style=notes_box))
+                story.append(Spacer(1, 6 * mm))
+        
+        doc.build(story)
@@ -2,36 +2,77 @@
 JD2Q Security Service
 Handles encryption, OTP validation, and security utilities.
 """
+import hashlib
+import hmac
 import os
+import re
 import secrets
-from datetime import datetime, timedelta
+from datetime import datetime
+from itertools import islice
 from cryptography.fernet import Fernet, InvalidToken
-from flask import current_app, session
+from flask import current_app, g, has_app_context, session
+
+# Every mask that can be shown in front of a key's visible suffix (at most
+# 20 characters), indexed by length
+_MASKS = tuple("*" * n for n in range(21))
+
+# Texts up to MAX_JD_WORDS times this many characters are split directly;
+# longer ones are counted lazily
+WORD_SPLIT_CHARS_PER_WORD = 10
+
+# Lazy counting stops at MAX_JD_WORDS times this, bounding work on huge pastes
+WORD_COUNT_CAP_FACTOR = 10
+
+WORD_RE = re.compile(r'\S+')
+
+# Password character class checks, compiled once
+PASSWORD_UPPER_RE = re.compile(r'[A-Z]')
+PASSWORD_LOWER_RE = re.compile(r'[a-z]')
+PASSWORD_DIGIT_RE = re.compile(r'\d')
 
 
 class SecurityService:
     """Security utilities for encryption, validation, and session management."""
     
+    @staticmethod
+    def init_app(app):
+        """
+        Build the API key cipher at app creation when a key is configured,
+        so requests never construct one (see get_fernet).
+        
+        Args:
+            app: Flask application instance
+        """
+        key = app.config.get('FERNET_SECRET_KEY')
+        if key:
+            app.extensions['fernet'] = (key, Fernet(key.encode() if isinstance(key, str) else key))
+    
     @staticmethod
     def get_fernet():
         """
         Get Fernet cipher instance from app config.
         
+        The cipher is built once per app (and rebuilt only if the configured
+        key changes) and kept in app.extensions.
+        
         Returns:
             Fernet cipher instance
             
         Raises:
             ValueError: If FERNET_SECRET_KEY not configured
         """
-        key = current_app.config.get('FERNET_SECRET_KEY')
+        # Resolve the app proxy once rather than on every attribute access
+        app = current_app._get_current_object()
+        key = app.config.get('FERNET_SECRET_KEY')
         if not key:
             raise ValueError("FERNET_SECRET_KEY not configured")
         
-        # Ensure key is bytes
-        if isinstance(key, str):
-            key = key.encode()
+        cached = app.extensions.get('fernet')
+        if cached is not None and cached[0] == key:
+            return cached[1]
         
-        return Fernet(key)
+        SecurityService.init_app(app)
+        return app.extensions['fernet'][1]
     
     @staticmethod
     def encrypt_api_key(api_key: str) -> str:
@@ -64,11 +105,39 @@ class SecurityService:
         """
         try:
             fernet = SecurityService.get_fernet()
-            decrypted = fernet.decrypt(encrypted_key.encode())
+            # Fernet base64-decodes str tokens itself; no encode() copy needed
+            decrypted = fernet.decrypt(encrypted_key)
             return decrypted.decode()
         except InvalidToken:
             raise ValueError("Failed to decrypt API key - invalid or corrupted data")
     
+    @staticmethod
+    def decrypt_api_key_cached(encrypted_key: str) -> str:
+        """
+        Decrypt an API key, memoized on flask.g for the current context.
+        
+        Repeated AI calls with the same key in one request (or background
+        task) decrypt it once. The plaintext lives only as long as the
+        application context.
+        
+        Args:
+            encrypted_key: Base64-encoded encrypted key
+            
+        Returns:
+            Plaintext API key
+            
+        Raises:
+            ValueError: If decryption fails
+        """
+        if not has_app_context():
+            return SecurityService.decrypt_api_key(encrypted_key)
+        
+        cache = g.setdefault('decrypted_keys', {})
+        cache_key = hashlib.blake2b(encrypted_key.encode(), digest_size=16).digest()
+        if cache_key not in cache:
+            cache[cache_key] = SecurityService.decrypt_api_key(encrypted_key)
+        return cache[cache_key]
+    
     @staticmethod
     def mask_api_key(api_key: str, visible_chars: int = 4) -> str:
         """
@@ -81,11 +150,12 @@ class SecurityService:
         Returns:
             Masked key (e.g., "****...xyz123")
         """
-        if len(api_key) <= visible_chars:
-            return "*" * len(api_key)
+        hidden = len(api_key) - visible_chars
+        if hidden <= 0 or visible_chars <= 0:
+            # Never reveal a whole key (api_key[-0:] would be all of it)
+            return _MASKS[min(len(api_key), 20)]
         
-        mask_length = len(api_key) - visible_chars
-        return ("*" * min(mask_length, 20)) + api_key[-visible_chars:]
+        return _MASKS[min(hidden, 20)] + api_key[-visible_chars:]
     
     @staticmethod
     def validate_password_strength(password: str) -> tuple[bool, str]:
@@ -101,13 +171,13 @@ class SecurityService:
         if len(password) < 8:
             return False, "Password must be at least 8 characters long"
         
-        if not any(c.isupper() for c in password):
+        if not PASSWORD_UPPER_RE.search(password):
             return False, "Password must contain at least one uppercase letter"
         
-        if not any(c.islower() for c in password):
+        if not PASSWORD_LOWER_RE.search(password):
             return False, "Password must contain at least one lowercase letter"
         
-        if not any(c.isdigit() for c in password):
+        if not PASSWORD_DIGIT_RE.search(password):
             return False, "Password must contain at least one digit"
         
         return True, ""
@@ -118,7 +188,7 @@ class SecurityService:
         Generate a secure random session token.
         
         Returns:
-            32-character hex token
+            64-character hex token (32 random bytes)
         """
         return secrets.token_hex(32)
     
@@ -132,8 +202,13 @@ class SecurityService:
             email: User email
             access_token: Optional Supabase access token
         """
+        # Fresh server-side session ID on login (no-op for cookie sessions)
+        if hasattr(session, 'regenerate'):
+            session.regenerate()
         session['user_id'] = user_id
+        g.user_id = user_id
         session['email'] = email
+        g.is_auth = True
         if access_token:
             session['access_token'] = access_token
         session['logged_in_at'] = datetime.utcnow().isoformat()
@@ -143,16 +218,20 @@ class SecurityService:
     def clear_session():
         """Clear all session data."""
         session.clear()
+        g.pop('user_id', None)
+        g.pop('is_auth', None)
     
     @staticmethod
     def get_session_user_id() -> str | None:
         """
-        Get current user ID from session.
+        Get current user ID from session, memoized on flask.g for the request.
         
         Returns:
             User ID or None if not authenticated
         """
-        return session.get('user_id')
+        if 'user_id' not in g:
+            g.user_id = session.get('user_id')
+        return g.user_id
     
     @staticmethod
     def get_session_access_token() -> str | None:
@@ -167,24 +246,42 @@ class SecurityService:
     @staticmethod
     def is_authenticated() -> bool:
         """
-        Check if user is authenticated.
+        Check if user is authenticated, memoized on flask.g for the request.
         
         Returns:
             True if user is logged in
         """
-        return 'user_id' in session and 'email' in session
+        if 'is_auth' not in g:
+            g.is_auth = 'user_id' in session and 'email' in session
+        return g.is_auth
 
 
 class OTPService:
     """OTP generation and validation service."""
     
-    # In-memory OTP storage (for production, use Redis or database)
-    _otp_store = {}
+    # OTP storage: one Redis hash per email (see app.extensions.get_redis),
+    # expired by Redis TTL
+    
+    @staticmethod
+    def get_redis():
+        """
+        Get the Redis client used for OTP storage.
+        
+        Returns:
+            redis.Redis instance
+        """
+        from app.extensions import get_redis
+        return get_redis()
+    
+    @staticmethod
+    def _key(email: str) -> str:
+        """Redis key holding the OTP for an email."""
+        return f"otp:{email}"
     
     @staticmethod
     def generate_otp(email: str) -> str:
         """
-        Generate a 4-digit OTP code.
+        Generate a 6-digit OTP code.
         
         Note: In production with Supabase Auth, OTP generation is handled
         by Supabase. This method is for testing/reference only.
@@ -193,19 +290,19 @@ class OTPService:
             email: Email address to associate with OTP
             
         Returns:
-            4-digit OTP code
+            6-digit OTP code
         """
-        otp = str(secrets.randbelow(1000000)).zfill(6)
+        otp = f"{secrets.randbelow(1000000):06d}"
         
-        # Store OTP with expiry
-        expiry_minutes = current_app.config.get('OTP_EXPIRY_MINUTES', 10)
-        expiry = datetime.utcnow() + timedelta(minutes=expiry_minutes)
+        # Store OTP; Redis expires it, so no expiry timestamp is kept. Both
+        # fields are overwritten, which also resets any previous code.
+        expiry_seconds = current_app.config.get('OTP_EXPIRY_MINUTES', 10) * 60
+        key = OTPService._key(email)
         
-        OTPService._otp_store[email] = {
-            'code': otp,
-            'expiry': expiry,
-            'attempts': 0
-        }
+        pipe = OTPService.get_redis().pipeline()
+        pipe.hset(key, mapping={'code': otp, 'attempts': 0})
+        pipe.expire(key, expiry_seconds)
+        pipe.execute()
         
         return otp
     
@@ -224,53 +321,61 @@ class OTPService:
         Returns:
             Tuple of (is_valid, error_message)
         """
-        if email not in OTPService._otp_store:
-            return False, "No OTP found for this email"
-        
-        otp_data = OTPService._otp_store[email]
+        r = OTPService.get_redis()
+        key = OTPService._key(email)
+        otp_data = r.hgetall(key)
         
-        # Check expiry
-        if datetime.utcnow() > otp_data['expiry']:
-            del OTPService._otp_store[email]
-            return False, "OTP has expired"
+        if not otp_data:
+            return False, "No valid OTP found for this email (it may have expired)"
         
         # Check attempts
         max_attempts = current_app.config.get('MAX_OTP_ATTEMPTS', 5)
-        if otp_data['attempts'] >= max_attempts:
-            del OTPService._otp_store[email]
+        if int(otp_data['attempts']) >= max_attempts:
+            r.delete(key)
             return False, "Maximum verification attempts exceeded"
         
-        # Verify code
-        if otp_data['code'] != code:
-            otp_data['attempts'] += 1
-            return False, f"Invalid OTP code ({max_attempts - otp_data['attempts']} attempts remaining)"
+        # Verify code (constant-time, so timing doesn't leak a matching prefix)
+        if not hmac.compare_digest(otp_data['code'].encode(), (code or '').encode()):
+            attempts = r.hincrby(key, 'attempts', 1)
+            return False, f"Invalid OTP code ({max(max_attempts - attempts, 0)} attempts remaining)"
         
-        # Valid OTP - remove from store
-        del OTPService._otp_store[email]
+        # Valid OTP - remove it; only the worker that deletes it succeeds
+        if not r.delete(key):
+            return False, "No valid OTP found for this email (it may have expired)"
         return True, ""
     
     @staticmethod
     def clear_otp(email: str):
         """Clear OTP for email."""
-        if email in OTPService._otp_store:
-            del OTPService._otp_store[email]
+        OTPService.get_redis().delete(OTPService._key(email))
 
 
 def validate_jd_word_count(text: str) -> tuple[bool, int]:
     """
     Validate job description word count.
     
+    Typical descriptions are counted with str.split(), several times faster
+    than regex matching. Text longer than WORD_SPLIT_CHARS_PER_WORD
+    characters per allowed word is counted lazily instead, stopping at
+    WORD_COUNT_CAP_FACTOR times the allowed words, so oversized input is
+    rejected without splitting it all.
+    
     Args:
         text: Job description text
         
     Returns:
-        Tuple of (is_valid, word_count)
+        Tuple of (is_valid, word_count); word_count is capped for huge input
     """
-    if not text or not text.strip():
+    if not text:
         return False, 0
     
-    words = text.split()
-    word_count = len(words)
     max_words = current_app.config.get('MAX_JD_WORDS', 1500)
+    if len(text) <= max_words * WORD_SPLIT_CHARS_PER_WORD:
+        word_count = len(text.split())
+    else:
+        word_cap = max_words * WORD_COUNT_CAP_FACTOR
+        word_count = sum(1 for _ in islice(WORD_RE.finditer(text), word_cap))
+    if not word_count:
+        return False, 0
     
     return word_count <= max_words, word_count
@@ -2,11 +2,25 @@
 JD2Q Supabase Service
 Wrapper for Supabase client operations with error handling and RLS.
 """
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 from flask import current_app, g
-from typing import Optional, Dict, List, Any
-from datetime import datetime
+from typing import Optional, Dict, List, Any, Iterable, Tuple
+from datetime import datetime, timedelta
+import queue
+import threading
+import uuid
 from app.services.security_service import SecurityService
+from app.services.task_service import TaskService
+
+# Redis keys for buffered API key usage counters
+KEY_USAGE_PENDING = 'keyusage:pending'
+KEY_USAGE_FLUSH_LOCK = 'keyusage:flush-lock'
+
+# Rows per questions insert, below PostgREST's default request limits
+QUESTION_INSERT_BATCH_SIZE = 500
+
+# Rows per activity_logs insert when draining the activity buffer
+ACTIVITY_LOG_BATCH_SIZE = 100
 
 
 class SupabaseService:
@@ -14,6 +28,12 @@ class SupabaseService:
     
     _client: Optional[Client] = None
     _admin_client: Optional[Client] = None
+    _client_lock = threading.Lock()
+    
+    # Buffered activity log rows, drained in batches on the 'activity' pool
+    _activity_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _activity_lock = threading.Lock()
+    _activity_drain_scheduled = False
     
     @classmethod
     def get_client(cls, use_service_role: bool = False) -> Client:
@@ -26,18 +46,24 @@ class SupabaseService:
         Returns:
             Supabase client instance
         """
-        url = current_app.config['SUPABASE_URL']
-        
-        if use_service_role:
-            if cls._admin_client is None:
-                key = current_app.config['SUPABASE_SERVICE_ROLE_KEY']
-                cls._admin_client = create_client(url, key)
-            return cls._admin_client
-        else:
-            if cls._client is None:
-                key = current_app.config['SUPABASE_ANON_KEY']
-                cls._client = create_client(url, key)
-            return cls._client
+        attr = '_admin_client' if use_service_role else '_client'
+        client = getattr(cls, attr)
+        if client is None:
+            # One client per process so every request reuses its pooled connections
+            with cls._client_lock:
+                client = getattr(cls, attr)
+                if client is None:
+                    key_name = 'SUPABASE_SERVICE_ROLE_KEY' if use_service_role else 'SUPABASE_ANON_KEY'
+                    options = ClientOptions(
+                        postgrest_client_timeout=current_app.config.get('SUPABASE_TIMEOUT_SECONDS', 10)
+                    )
+                    client = create_client(
+                        current_app.config['SUPABASE_URL'],
+                        current_app.config[key_name],
+                        options=options
+                    )
+                    setattr(cls, attr, client)
+        return client
     
     @staticmethod
     def sign_in_with_otp(email: str) -> Dict[str, Any]:
@@ -153,18 +179,42 @@ class SupabaseService:
         """
         Get user by ID from users table.
         
+        Found users are cached under user:{user_id} for USER_CACHE_SECONDS so
+        requests on any worker skip the Supabase round-trip; update_user
+        invalidates the entry.
+        
         Args:
             user_id: Supabase user ID
             
         Returns:
             User data or None if not found
         """
+        from app.extensions import cache
+        
+        cache_key = f'user:{user_id}'
+        try:
+            cached = cache.get(cache_key)
+        except Exception as e:
+            current_app.logger.warning(f"User cache read failed: {str(e)}")
+            cached = None
+        
+        if cached:
+            return cached
+        
         try:
             client = SupabaseService.get_client()
             response = client.table('users').select('*').eq('id', user_id).maybe_single().execute()
-            return response.data
+            user = response.data
         except Exception:
             return None
+        
+        if user:
+            try:
+                cache.set(cache_key, user, timeout=current_app.config.get('USER_CACHE_SECONDS', 60))
+            except Exception as e:
+                current_app.logger.warning(f"User cache write failed: {str(e)}")
+        
+        return user
     
     @staticmethod
     def create_user(user_id: str, email: str, display_name: str = None) -> Dict[str, Any]:
@@ -180,12 +230,13 @@ class SupabaseService:
             Created user data
         """
         client = SupabaseService.get_client()
+        now = datetime.utcnow().isoformat()
         data = {
             'id': user_id,
             'email': email,
             'display_name': display_name or email.split('@')[0],
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat()
+            'created_at': now,
+            'updated_at': now
         }
         response = client.table('users').insert(data).execute()
         return response.data[0] if response.data else None
@@ -200,11 +251,27 @@ class SupabaseService:
             updates: Dictionary of fields to update
             
         Returns:
-            Updated user data
+            Updated user data, or None if there was nothing to update
         """
+        # updated_at is set here; an update carrying nothing else is a no-op
+        if not any(field != 'updated_at' for field in updates):
+            return None
+        
         client = SupabaseService.get_client()
-        updates['updated_at'] = datetime.utcnow().isoformat()
+        updates = {**updates, 'updated_at': datetime.utcnow().isoformat()}
+        # PostgREST returns the updated row (Prefer: return=representation)
         response = client.table('users').update(updates).eq('id', user_id).execute()
+        
+        from app.extensions import cache
+        
+        try:
+            cache.delete(f'user:{user_id}')
+        except Exception as e:
+            current_app.logger.warning(f"User cache delete failed: {str(e)}")
+        
+        return response.data[0] if response.data else None
+    
+    @staticmethod
     def get_api_keys(user_id: str) -> List[Dict[str, Any]]:
         """
         Get all API keys for a user. Filters out soft-deleted keys.
@@ -216,15 +283,40 @@ class SupabaseService:
             List of API key dictionaries
         """
         client = SupabaseService.get_client()
-        response = client.table('api_keys').select('*').eq('user_id', user_id).order('created_at', desc=True).execute()
+        # Soft-deleted keys (prefixed with [DELETED]) are filtered out by PostgREST
+        response = (client.table('api_keys')
+                   .select('*')
+                   .eq('user_id', user_id)
+                   .not_.like('key_name', '[DELETED]%')
+                   .order('created_at', desc=True)
+                   .execute())
         
-        # Filter out keys that were soft-deleted (prefixed with [DELETED])
-        keys = []
-        for key in (response.data or []):
-            if not key.get('key_name', '').startswith('[DELETED]'):
-                keys.append(key)
+        return response.data or []
+    
+    @staticmethod
+    def get_api_key(user_id: str, api_key_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a single API key owned by a user. Soft-deleted keys are ignored.
         
-        return keys
+        Args:
+            user_id: User ID (for ownership check)
+            api_key_id: API key ID
+            
+        Returns:
+            API key record (id, key_name, encrypted_key) or None if not found
+        """
+        client = SupabaseService.get_client()
+        response = (client.table('api_keys')
+                   .select('id, key_name, encrypted_key')
+                   .eq('user_id', user_id)
+                   .eq('id', api_key_id)
+                   .limit(1)
+                   .execute())
+        
+        if not response.data or response.data[0].get('key_name', '').startswith('[DELETED]'):
+            return None
+        
+        return response.data[0]
     
     @staticmethod
     def create_api_key(user_id: str, key_name: str, api_key: str) -> Dict[str, Any]:
@@ -264,30 +356,113 @@ class SupabaseService:
         """
         client = SupabaseService.get_client()
         
-        try:
-            # 1. Try to delete directly
-            client.table('api_keys').delete().eq('id', key_id).eq('user_id', user_id).execute()
-        except Exception:
-            # 2. If it fails (due to FK constraint from generation_requests),
-            # we perform a "soft delete" by renaming the key so it stays in DB for history 
-            # but is hidden from the user's key list.
-            timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M')
-            client.table('api_keys').update({
-                'key_name': f"[DELETED] {timestamp}"
-            }).eq('id', key_id).eq('user_id', user_id).execute()
+        # Delete-or-rename happens in one RPC (see sql/08_delete_api_key.sql)
+        client.rpc('delete_or_soft_delete_api_key', {
+            'p_key_id': key_id,
+            'p_user_id': user_id
+        }).execute()
     
     @staticmethod
     def increment_key_usage(key_id: str):
         """
         Increment usage counter for API key.
         
+        With KEY_USAGE_BUFFERED the increment is an O(1) Redis HINCRBY and the
+        counters are written to Postgres in batches (see flush_key_usage) at
+        most every KEY_USAGE_FLUSH_SECONDS, on the activity pool so the
+        request never waits on the RPC. Falls back to a direct RPC when
+        buffering is off or Redis is unavailable.
+        
         Args:
             key_id: API key ID
         """
+        if current_app.config.get('KEY_USAGE_BUFFERED', True):
+            from app.extensions import get_redis
+            
+            try:
+                r = get_redis()
+                r.hincrby(KEY_USAGE_PENDING, key_id, 1)
+            except Exception as e:
+                current_app.logger.warning(f"Buffered key usage failed, writing directly: {str(e)}")
+            else:
+                # The increment is recorded; flush failures only delay it
+                try:
+                    flush_seconds = current_app.config.get('KEY_USAGE_FLUSH_SECONDS', 30)
+                    if r.set(KEY_USAGE_FLUSH_LOCK, 1, nx=True, ex=flush_seconds):
+                        TaskService.submit_to('activity', SupabaseService.flush_key_usage)
+                except Exception as e:
+                    current_app.logger.warning(f"Key usage flush failed: {str(e)}")
+                return
+        
         client = SupabaseService.get_client(use_service_role=True)
         # Use service role to bypass RLS for increment operation
         client.rpc('increment_key_usage', {'key_id': key_id}).execute()
     
+    @staticmethod
+    def get_pending_key_usage(key_ids: List[str]) -> Dict[str, int]:
+        """
+        Get buffered usage counts not yet flushed to Postgres (read-only).
+        
+        Args:
+            key_ids: API key IDs
+            
+        Returns:
+            Key ID to pending count; empty when buffering is off or Redis fails
+        """
+        if not key_ids or not current_app.config.get('KEY_USAGE_BUFFERED', True):
+            return {}
+        
+        from app.extensions import get_redis
+        
+        try:
+            counts = get_redis().hmget(KEY_USAGE_PENDING, key_ids)
+        except Exception as e:
+            current_app.logger.warning(f"Pending key usage read failed: {str(e)}")
+            return {}
+        
+        return {key_id: int(count) for key_id, count in zip(key_ids, counts) if count}
+    
+    @staticmethod
+    def flush_key_usage() -> int:
+        """
+        Write buffered API key usage counters to Postgres in one RPC.
+        
+        The pending hash is atomically renamed first, so increments arriving
+        during the flush land in a fresh hash. If the RPC fails the counts are
+        merged back for the next flush.
+        
+        Returns:
+            Number of keys flushed
+        """
+        if not current_app.config.get('KEY_USAGE_BUFFERED', True):
+            return 0
+        
+        import redis
+        from app.extensions import get_redis
+        
+        r = get_redis()
+        batch_key = f'{KEY_USAGE_PENDING}:flushing:{uuid.uuid4().hex}'
+        try:
+            r.rename(KEY_USAGE_PENDING, batch_key)
+        except redis.ResponseError:
+            return 0  # Nothing pending
+        
+        counts = {key_id: int(count) for key_id, count in r.hgetall(batch_key).items()}
+        
+        try:
+            client = SupabaseService.get_client(use_service_role=True)
+            client.rpc('add_key_usage', {'p_counts': counts}).execute()
+        except Exception:
+            pipe = r.pipeline()
+            for key_id, count in counts.items():
+                pipe.hincrby(KEY_USAGE_PENDING, key_id, count)
+            pipe.delete(batch_key)
+            pipe.execute()
+            raise
+        
+        r.delete(batch_key)
+        return len(counts)
+    
     @staticmethod
     def create_generation_request(user_id: str, api_key_id: str, job_description: str) -> Dict[str, Any]:
         """
@@ -346,74 +521,260 @@ class SupabaseService:
         return response.data
     
     @staticmethod
-    def get_user_generations(user_id: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+    def get_user_generations(user_id: str, limit: int = 50,
+                             after: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
         """
-        Get generation history for user.
+        Get generation history for user, newest first (keyset pagination).
         
         Args:
             user_id: User ID
             limit: Number of records to return
-            offset: Offset for pagination
+            after: Optional (created_at, id) of the last row of the previous page
             
         Returns:
             List of generation requests
         """
         client = SupabaseService.get_client()
-        response = (client.table('generation_requests')
-                   .select('*')
-                   .eq('user_id', user_id)
+        query = (client.table('generation_requests')
+                .select('*')
+                .eq('user_id', user_id))
+        
+        if after:
+            created_at, last_id = after
+            # Row-value comparison (created_at, id) < (after) expressed for PostgREST
+            query = query.or_(
+                f'created_at.lt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.lt."{last_id}")'
+            )
+        
+        response = (query
                    .order('created_at', desc=True)
+                   .order('id', desc=True)
                    .limit(limit)
-                   .offset(offset)
                    .execute())
         return response.data or []
     
     @staticmethod
-    def create_questions(generation_id: str, questions: List[Dict[str, Any]]):
+    def create_questions(generation_id: str, questions: Iterable[Dict[str, Any]]) -> int:
         """
-        Bulk create questions for a generation.
+        Bulk create questions for a generation in batched inserts.
         
         Args:
             generation_id: Generation request ID
-            questions: List of question data dicts
+            questions: Iterable of flatten_questions-shaped dicts
+            
+        Returns:
+            Number of questions inserted
         """
         client = SupabaseService.get_client()
         
-        records = []
-        for q in questions:
-            records.append({
+        # Read the clock once; readers order questions by created_at, so each
+        # record is offset by one microsecond to keep insertion order
+        now = datetime.utcnow()
+        records = [
+            {
                 'generation_id': generation_id,
-                'question_id': q.get('id'),
-                'section_title': q.get('section_title'),
-                'skill': q.get('skill'),
-                'question_type': q.get('type'),
-                'difficulty': q.get('difficulty'),
-                'question_text': q.get('text'),
-                'expected_signals': q.get('expected_signals', []),
-                'created_at': datetime.utcnow().isoformat()
-            })
+                'question_id': q['id'],
+                'section_title': q['section_title'],
+                'skill': q['skill'],
+                'question_type': q['type'],
+                'difficulty': q['difficulty'],
+                'question_text': q['text'],
+                'expected_signals': q.get('expected_signals') or [],
+                'created_at': (now + timedelta(microseconds=index)).isoformat()
+            }
+            for index, q in enumerate(questions)
+        ]
         
-        if records:
-            client.table('questions').insert(records).execute()
+        for start in range(0, len(records), QUESTION_INSERT_BATCH_SIZE):
+            client.table('questions').insert(records[start:start + QUESTION_INSERT_BATCH_SIZE]).execute()
+        
+        return len(records)
     
     @staticmethod
-    def get_questions_for_generation(generation_id: str) -> List[Dict[str, Any]]:
+    def get_questions_for_generation(generation_id: str, columns: str = '*') -> List[Dict[str, Any]]:
         """
-        Get all questions for a generation.
+        Get all questions for a generation, in insertion (section) order.
+        
+        Results are cached under questions:{generation_id}, one entry per
+        column list, for GENERATION_CACHE_SECONDS. Questions are inserted
+        before a generation completes, so only non-empty results are cached;
+        answer writers drop the entry via invalidate_generation_cache.
+        Callers check ownership before asking for a generation's questions.
         
         Args:
             generation_id: Generation request ID
+            columns: Comma-separated columns to select (defaults to all)
             
         Returns:
             List of questions
         """
+        from app.extensions import cache
+        
+        cache_key = f'questions:{generation_id}'
+        try:
+            cached = cache.get(cache_key) or {}
+        except Exception as e:
+            current_app.logger.warning(f"Questions cache read failed: {str(e)}")
+            cached = {}
+        
+        if columns in cached:
+            return cached[columns]
+        
         client = SupabaseService.get_client()
         response = (client.table('questions')
-                   .select('*')
+                   .select(columns)
                    .eq('generation_id', generation_id)
                    .order('created_at')
                    .execute())
-        return response.data or []
+        questions = response.data or []
+        
+        if questions:
+            try:
+                cache.set(cache_key, {**cached, columns: questions},
+                          timeout=current_app.config.get('GENERATION_CACHE_SECONDS', 3600))
+            except Exception as e:
+                current_app.logger.warning(f"Questions cache write failed: {str(e)}")
+        
+        return questions
+    
+    @staticmethod
+    def get_generation_with_questions(gen_id: str, user_id: str) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Get a generation request and its questions, cached once completed.
+        
+        The questions are embedded in the request query (one round-trip).
+        Completed generations are immutable apart from generated answers,
+        which invalidate the entry (see invalidate_generation_cache).
+        
+        Args:
+            gen_id: Generation request ID
+            user_id: User ID (for ownership check, part of the cache key)
+            
+        Returns:
+            Tuple of (generation request or None, list of questions)
+        """
+        def load():
+            # Embed the questions so request and rows arrive in one round-trip
+            client = SupabaseService.get_client()
+            response = (client.table('generation_requests')
+                       .select('*, questions(*)')
+                       .eq('id', gen_id)
+                       .eq('user_id', user_id)
+                       .order('created_at', foreign_table='questions')
+                       .maybe_single()
+                       .execute())
+            if not response or not response.data:
+                return None, []
+            gen_request = response.data
+            return gen_request, gen_request.pop('questions', None) or []
+        
+        return SupabaseService._cached_generation(f'generation:{user_id}:{gen_id}', load)
+    
+    @staticmethod
+    def get_generation_sections(gen_id: str, user_id: str) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Get a generation request and its questions grouped into sections.
+        
+        Grouping happens in the get_generation_sections RPC, so this is one
+        round-trip; the result is cached like get_generation_with_questions.
+        
+        Args:
+            gen_id: Generation request ID
+            user_id: User ID (for ownership check, part of the cache key)
+            
+        Returns:
+            Tuple of (generation request or None, list of sections with
+            'title', 'skill' and 'questions')
+        """
+        def load():
+            client = SupabaseService.get_client()
+            response = client.rpc('get_generation_sections', {
+                'p_gen_id': gen_id,
+                'p_user_id': user_id
+            }).execute()
+            if not response.data:
+                return None, []
+            return response.data['generation'], response.data['sections']
+        
+        return SupabaseService._cached_generation(f'sections:{user_id}:{gen_id}', load)
+    
+    @staticmethod
+    def _cached_generation(cache_key: str, load) -> Tuple[Optional[Dict[str, Any]], Any]:
+        """
+        Read-through cache for (generation request, payload) pairs.
+        
+        Only completed generations are cached; cache errors are logged and
+        fall through to the loader.
+        
+        Args:
+            cache_key: Cache key
+            load: Callable returning (generation request or None, payload)
+            
+        Returns:
+            Tuple of (generation request or None, payload)
+        """
+        from app.extensions import cache
+        
+        try:
+            cached = cache.get(cache_key)
+        except Exception as e:
+            current_app.logger.warning(f"Generation cache read failed: {str(e)}")
+            cached = None
+        
+        if cached:
+            return cached
+        
+        gen_request, payload = load()
+        
+        if gen_request and gen_request.get('status') == 'completed':
+            try:
+                cache.set(cache_key, (gen_request, payload),
+                          timeout=current_app.config.get('GENERATION_CACHE_SECONDS', 3600))
+            except Exception as e:
+                current_app.logger.warning(f"Generation cache write failed: {str(e)}")
+        
+        return gen_request, payload
+    
+    @staticmethod
+    def invalidate_generation_cache(gen_id: str, user_id: str):
+        """
+        Drop a cached generation so the next read refetches it.
+        
+        Args:
+            gen_id: Generation request ID
+            user_id: User ID
+        """
+        from app.extensions import cache
+        
+        # One delete per key: Flask-Caching's delete_many stops at the first
+        # key that isn't cached
+        try:
+            for cache_key in (f'generation:{user_id}:{gen_id}',
+                              f'sections:{user_id}:{gen_id}',
+                              f'questions:{gen_id}'):
+                cache.delete(cache_key)
+        except Exception as e:
+            current_app.logger.warning(f"Generation cache delete failed: {str(e)}")
+    
+    @staticmethod
+    def get_answer_context(question_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a question and its generation's encrypted API key in one call.
+        
+        Args:
+            question_id: Question ID
+            user_id: User ID (for ownership check)
+            
+        Returns:
+            Question data with 'encrypted_key', or None if not found/not owned
+        """
+        client = SupabaseService.get_client()
+        response = client.rpc('get_answer_context', {
+            'p_question_id': question_id,
+            'p_user_id': user_id
+        }).execute()
+        return response.data[0] if response.data else None
     
     @staticmethod
     def update_question_answer(question_id: str, answer: str):
@@ -453,7 +814,65 @@ class SupabaseService:
             client.table('activity_logs').insert(data).execute()
         except Exception:
             pass  # Don't fail operations due to logging errors
-
+    
+    @staticmethod
+    def log_activity_async(user_id: str, action: str, entity_type: str = None,
+                           entity_id: str = None, metadata: Dict = None):
+        """
+        Log user activity in the background (fire-and-forget).
+        
+        The row is timestamped now and buffered; one drain task at a time
+        writes buffered rows in multi-row inserts (see flush_activity_logs).
+        Arguments are the same as log_activity.
+        """
+        SupabaseService._activity_queue.put({
+            'user_id': user_id,
+            'action': action,
+            'entity_type': entity_type,
+            'entity_id': entity_id,
+            'metadata': metadata or {},
+            'created_at': datetime.utcnow().isoformat()
+        })
+        
+        with SupabaseService._activity_lock:
+            if SupabaseService._activity_drain_scheduled:
+                return
+            SupabaseService._activity_drain_scheduled = True
+        
+        try:
+            TaskService.submit_to('activity', SupabaseService.flush_activity_logs)
+        except Exception:
+            # Let the next call schedule a drain
+            with SupabaseService._activity_lock:
+                SupabaseService._activity_drain_scheduled = False
+            raise
+    
+    @staticmethod
+    def flush_activity_logs():
+        """
+        Write buffered activity rows, ACTIVITY_LOG_BATCH_SIZE per insert,
+        until the buffer is empty. Failed batches are logged and dropped.
+        """
+        pending = SupabaseService._activity_queue
+        
+        while True:
+            with SupabaseService._activity_lock:
+                batch = []
+                while len(batch) < ACTIVITY_LOG_BATCH_SIZE:
+                    try:
+                        batch.append(pending.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    SupabaseService._activity_drain_scheduled = False
+                    return
+            
+            try:
+                client = SupabaseService.get_client()
+                client.table('activity_logs').insert(batch).execute()
+            except Exception as e:
+                current_app.logger.warning(f"Activity log insert failed ({len(batch)} rows): {str(e)}")
+    
     @staticmethod
     def toggle_favorite(user_id: str, question_id: str) -> bool:
         """
@@ -468,25 +887,12 @@ class SupabaseService:
         """
         client = SupabaseService.get_client()
         
-        # Check if exists
-        existing = (client.table('favorites')
-                   .select('*')
-                   .eq('user_id', user_id)
-                   .eq('question_id', question_id)
-                   .maybe_single()
-                   .execute())
-        
-        if existing.data:
-            # Delete if exists
-            client.table('favorites').delete().eq('id', existing.data['id']).execute()
-            return False
-        else:
-            # Create if not exists
-            client.table('favorites').insert({
-                'user_id': user_id,
-                'question_id': question_id
-            }).execute()
-            return True
+        # Check-and-flip happens atomically in one RPC (see sql/06_toggle_favorite.sql)
+        response = client.rpc('toggle_favorite', {
+            'p_user_id': user_id,
+            'p_question_id': question_id
+        }).execute()
+        return bool(response.data)
 
     @staticmethod
     def get_user_favorites(user_id: str) -> List[Dict[str, Any]]:
@@ -501,30 +907,21 @@ class SupabaseService:
         """
         client = SupabaseService.get_client()
         
-        # Get favorite entries
-        favs = (client.table('favorites')
-               .select('question_id, created_at')
-               .eq('user_id', user_id)
-               .execute())
+        # Embed the questions through the favorites.question_id FK (one round-trip)
+        response = (client.table('favorites')
+                   .select('created_at, questions(*)')
+                   .eq('user_id', user_id)
+                   .order('created_at', desc=True)
+                   .execute())
         
-        if not favs.data:
-            return []
-            
-        question_ids = [f['question_id'] for f in favs.data]
-        
-        # Get actual questions
-        questions = (client.table('questions')
-                    .select('*')
-                    .in_('id', question_ids)
-                    .execute())
-                    
-        return questions.data or []
+        return [row['questions'] for row in response.data or [] if row.get('questions')]
 
 
 def get_current_user() -> Optional[Dict[str, Any]]:
     """
     Get current authenticated user from session.
-    Cached in flush global 'g' to prevent duplicate DB calls.
+    Cached in flask global 'g' for the request; across requests
+    SupabaseService.get_user serves it from the shared cache.
     
     Returns:
         User data or None if not authenticated
@@ -537,9 +934,13 @@ def get_current_user() -> Optional[Dict[str, Any]]:
         g.current_user = None
         return None
     
-    user = SupabaseService.get_user(user_id)
-    g.current_user = user
-    return user
+    g.current_user = SupabaseService.get_user(user_id)
+    return g.current_user
+
+
+def invalidate_current_user():
+    """Drop the request's cached user (update_user clears the shared cache)."""
+    g.pop('current_user', None)
 
 
 def login_required(f):
@@ -0,0 +1,100 @@
+"""
+JD2Q Task Service
+Runs slow work (e.g. Gemini generation) off the request thread.
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from flask import current_app
+
+
+class TaskService:
+    """In-process background task runner backed by thread pools."""
+    
+    # Pool name -> (config key holding its worker count, config key enabling
+    # it; a disabled pool runs work inline). Activity logging gets its own
+    # pool, and switch, so cheap inserts never queue behind slow generations
+    # and stay off the request even where generation runs inline.
+    POOLS = {
+        'tasks': ('BACKGROUND_WORKERS', 'BACKGROUND_TASKS_ENABLED'),
+        'activity': ('ACTIVITY_LOG_WORKERS', 'ACTIVITY_LOG_ASYNC'),
+    }
+    
+    _executors: Dict[str, ThreadPoolExecutor] = {}
+    _lock = threading.Lock()
+    
+    @classmethod
+    def get_executor(cls, pool: str = 'tasks') -> ThreadPoolExecutor:
+        """
+        Get a shared thread pool, creating it on first use.
+        
+        Pending work is drained at interpreter exit by concurrent.futures.
+        
+        Args:
+            pool: Pool name (see POOLS)
+            
+        Returns:
+            ThreadPoolExecutor instance
+        """
+        executor = cls._executors.get(pool)
+        if executor is None:
+            with cls._lock:
+                executor = cls._executors.get(pool)
+                if executor is None:
+                    max_workers = current_app.config.get(cls.POOLS[pool][0], 4)
+                    executor = ThreadPoolExecutor(
+                        max_workers=max_workers,
+                        thread_name_prefix=f'jd2q-{pool}'
+                    )
+                    cls._executors[pool] = executor
+        return executor
+    
+    @staticmethod
+    def submit(func: Callable[..., Any], *args, **kwargs) -> Optional[Future]:
+        """
+        Run a function in the background inside an application context.
+        
+        When BACKGROUND_TASKS_ENABLED is False (the default, and in testing)
+        the function runs inline instead.
+        
+        Args:
+            func: Callable to run
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+            
+        Returns:
+            Future for the task, or None if it ran inline
+        """
+        return TaskService.submit_to('tasks', func, *args, **kwargs)
+    
+    @staticmethod
+    def submit_to(pool: str, func: Callable[..., Any], *args, **kwargs) -> Optional[Future]:
+        """
+        Run a function on a named pool inside an application context.
+        
+        Runs inline instead when the pool's enabling config key is False.
+        
+        Args:
+            pool: Pool name (see POOLS)
+            func: Callable to run
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+            
+        Returns:
+            Future for the task, or None if it ran inline
+        """
+        if not current_app.config.get(TaskService.POOLS[pool][1], True):
+            func(*args, **kwargs)
+            return None
+        
+        app = current_app._get_current_object()
+        
+        def run():
+            with app.app_context():
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    app.logger.error(f"Background task {func.__name__} failed: {str(e)}")
+                    raise
+        
+        return TaskService.get_executor(pool).submit(run)
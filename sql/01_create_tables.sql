@@ -47,6 +47,8 @@
   CREATE INDEX IF NOT EXISTS idx_generation_requests_user_id ON generation_requests(user_id);
   CREATE INDEX IF NOT EXISTS idx_generation_requests_created_at ON generation_requests(created_at DESC);
   CREATE INDEX IF NOT EXISTS idx_generation_requests_status ON generation_requests(status);
+  -- Keyset pagination of a user's history: (created_at, id) seek per user
+  CREATE INDEX IF NOT EXISTS idx_generation_requests_user_created ON generation_requests(user_id, created_at DESC, id DESC);
 
   -- Questions table
   CREATE TABLE IF NOT EXISTS questions (
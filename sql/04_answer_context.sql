@@ -0,0 +1,35 @@
+-- Answer generation context
+-- Returns a question together with the encrypted API key of its generation
+-- in a single round-trip. Ownership is enforced by the user_id filter (and by
+-- RLS, since the function runs with the caller's privileges).
+
+CREATE OR REPLACE FUNCTION get_answer_context(p_question_id UUID, p_user_id UUID)
+RETURNS TABLE (
+  id UUID,
+  generation_id UUID,
+  skill TEXT,
+  question_type TEXT,
+  difficulty TEXT,
+  question_text TEXT,
+  expected_signals JSONB,
+  generated_answer TEXT,
+  encrypted_key TEXT
+) AS $$
+  SELECT q.id,
+         q.generation_id,
+         q.skill,
+         q.question_type,
+         q.difficulty,
+         q.question_text,
+         q.expected_signals,
+         q.generated_answer,
+         k.encrypted_key
+  FROM questions q
+  JOIN generation_requests g ON g.id = q.generation_id
+  LEFT JOIN api_keys k ON k.id = g.api_key_id
+  WHERE q.id = p_question_id
+    AND g.user_id = p_user_id;
+$$ LANGUAGE sql STABLE;
+
+-- Grant execute on function
+GRANT EXECUTE ON FUNCTION get_answer_context(UUID, UUID) TO authenticated;
@@ -0,0 +1,33 @@
+-- Generation with nested sections
+-- Returns a generation request together with its questions already grouped
+-- into sections (in first-question order), so the history view and print
+-- export need a single round-trip and no regrouping. Returns NULL when the
+-- generation does not exist or is not owned by the user.
+
+CREATE OR REPLACE FUNCTION get_generation_sections(p_gen_id UUID, p_user_id UUID)
+RETURNS JSONB AS $$
+  SELECT jsonb_build_object(
+    'generation', to_jsonb(g.*),
+    'sections', COALESCE((
+      SELECT jsonb_agg(
+               jsonb_build_object('title', s.title, 'skill', s.skill, 'questions', s.questions)
+               ORDER BY s.first_created_at
+             )
+      FROM (
+        SELECT COALESCE(q.section_title, 'General') AS title,
+               (array_agg(q.skill ORDER BY q.created_at))[1] AS skill,
+               jsonb_agg(to_jsonb(q.*) - 'generation_id' - 'section_title' ORDER BY q.created_at) AS questions,
+               min(q.created_at) AS first_created_at
+        FROM questions q
+        WHERE q.generation_id = g.id
+        GROUP BY COALESCE(q.section_title, 'General')
+      ) s
+    ), '[]'::jsonb)
+  )
+  FROM generation_requests g
+  WHERE g.id = p_gen_id
+    AND g.user_id = p_user_id;
+$$ LANGUAGE sql STABLE;
+
+-- Grant execute on function
+GRANT EXECUTE ON FUNCTION get_generation_sections(UUID, UUID) TO authenticated;
@@ -0,0 +1,28 @@
+-- Favorite toggle
+-- Flips a question's favorite state for a user in a single round-trip and
+-- returns the new state (TRUE = favored). Deleting first and inserting only
+-- when nothing was deleted makes the flip atomic; the UNIQUE(user_id,
+-- question_id) constraint absorbs concurrent double inserts. Runs with the
+-- caller's privileges, so the favorites RLS policies still apply.
+
+CREATE OR REPLACE FUNCTION toggle_favorite(p_user_id UUID, p_question_id UUID)
+RETURNS BOOLEAN AS $$
+BEGIN
+  DELETE FROM favorites
+  WHERE user_id = p_user_id
+    AND question_id = p_question_id;
+
+  IF FOUND THEN
+    RETURN FALSE;
+  END IF;
+
+  INSERT INTO favorites (user_id, question_id)
+  VALUES (p_user_id, p_question_id)
+  ON CONFLICT (user_id, question_id) DO NOTHING;
+
+  RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Grant execute on function
+GRANT EXECUTE ON FUNCTION toggle_favorite(UUID, UUID) TO authenticated;
@@ -0,0 +1,17 @@
+-- Batched API key usage
+-- Applies buffered usage counters (flushed from Redis by the app) in one
+-- statement. p_counts maps api_keys.id to the number of uses to add, e.g.
+-- {"6f1c...": 3, "a0b2...": 1}. Only the service role may call it.
+
+CREATE OR REPLACE FUNCTION add_key_usage(p_counts JSONB)
+RETURNS VOID AS $$
+  UPDATE api_keys k
+  SET usage_count = k.usage_count + c.value::INTEGER,
+      last_used = NOW()
+  FROM jsonb_each_text(p_counts) AS c(key, value)
+  WHERE k.id = c.key::UUID;
+$$ LANGUAGE sql SECURITY DEFINER;
+
+-- Restrict execute to the service role
+REVOKE EXECUTE ON FUNCTION add_key_usage(JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION add_key_usage(JSONB) TO service_role;
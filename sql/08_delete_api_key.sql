@@ -0,0 +1,28 @@
+-- API key deletion
+-- Deletes a user's API key in a single round-trip. Keys still referenced by
+-- generation_requests (ON DELETE RESTRICT) are soft-deleted instead: renamed
+-- with a [DELETED] prefix so history keeps its key while the key list hides
+-- it. Runs with the caller's privileges, so the api_keys RLS policies still
+-- apply.
+
+CREATE OR REPLACE FUNCTION delete_or_soft_delete_api_key(p_key_id UUID, p_user_id UUID)
+RETURNS VOID AS $$
+BEGIN
+  DELETE FROM api_keys
+  WHERE id = p_key_id
+    AND user_id = p_user_id
+    AND NOT EXISTS (
+      SELECT 1 FROM generation_requests WHERE api_key_id = p_key_id
+    );
+
+  IF NOT FOUND THEN
+    UPDATE api_keys
+    SET key_name = '[DELETED] ' || to_char(NOW() AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI')
+    WHERE id = p_key_id
+      AND user_id = p_user_id;
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Grant execute on function
+GRANT EXECUTE ON FUNCTION delete_or_soft_delete_api_key(UUID, UUID) TO authenticated;
@@ -0,0 +1,7 @@
+-- Active API keys index
+-- Key lists exclude soft-deleted keys (key_name prefixed with [DELETED]);
+-- this partial index serves that filter without scanning historical keys.
+
+CREATE INDEX IF NOT EXISTS idx_api_keys_user_active
+  ON api_keys(user_id, created_at DESC)
+  WHERE key_name NOT LIKE '[DELETED]%';
@@ -3,16 +3,26 @@ Test configuration and fixtures for pytest.
 """
 import pytest
 import os
+from cryptography.fernet import Fernet
 from app import create_app
+from app.services.security_service import SecurityService
 
 
-@pytest.fixture
-def app():
-    """Create Flask app for testing."""
+@pytest.fixture(scope='session')
+def fernet_key():
+    """Fernet key shared by the whole test session."""
+    return Fernet.generate_key().decode()
+
+
+@pytest.fixture(scope='session')
+def app(fernet_key):
+    """Create Flask app for testing (once per session)."""
     # Set test environment
     os.environ['FLASK_ENV'] = 'testing'
     
     app = create_app('testing')
+    app.config['FERNET_SECRET_KEY'] = fernet_key
+    SecurityService.init_app(app)
     
     yield app
 
@@ -80,3 +90,85 @@ def mock_supabase_client(monkeypatch):
     monkeypatch.setattr('app.services.supabase_service.create_client', mock_create_client)
     
     return mock_create_client
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """In-memory stand-in for the shared Redis client (see app.extensions.get_redis)."""
+    class FakeRedis:
+        def __init__(self):
+            self.data = {}
+            self.fail = False
+        
+        def _check(self):
+            if self.fail:
+                raise ConnectionError("Redis unavailable")
+        
+        def get(self, key):
+            self._check()
+            return self.data.get(key)
+        
+        def set(self, key, value, ex=None):
+            self._check()
+            self.data[key] = value
+        
+        def expire(self, key, ttl):
+            self._check()
+        
+        def delete(self, key):
+            self._check()
+            return 1 if self.data.pop(key, None) is not None else 0
+        
+        def hset(self, key, mapping):
+            self._check()
+            self.data.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+        
+        def hgetall(self, key):
+            self._check()
+            return dict(self.data.get(key, {}))
+        
+        def hmget(self, key, fields):
+            self._check()
+            values = self.data.get(key, {})
+            return [values.get(field) for field in fields]
+        
+        def hincrby(self, key, field, amount=1):
+            self._check()
+            value = int(self.data.setdefault(key, {}).get(field, 0)) + amount
+            self.data[key][field] = str(value)
+            return value
+        
+        def pipeline(self):
+            redis = self
+            
+            class Pipeline:
+                def __init__(self):
+                    self.calls = []
+                
+                def __getattr__(self, name):
+                    return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+                
+                def execute(self):
+                    return [getattr(redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+            
+            return Pipeline()
+    
+    redis = FakeRedis()
+    monkeypatch.setattr('app.extensions.get_redis', lambda: redis)
+    return redis
+
+
+@pytest.fixture
+def auth_client(client, monkeypatch):
+    """Test client logged in as a user that exists without hitting Supabase."""
+    from app.services.supabase_service import SupabaseService
+    
+    user = {'id': 'test-user-id', 'email': 'user@example.com', 'display_name': 'Test User'}
+    monkeypatch.setattr(SupabaseService, 'get_user', staticmethod(lambda user_id: user))
+    monkeypatch.setattr(SupabaseService, 'log_activity_async', staticmethod(lambda *args, **kwargs: None))
+    
+    with client.session_transaction() as sess:
+        sess['user_id'] = user['id']
+        sess['email'] = user['email']
+    
+    return client
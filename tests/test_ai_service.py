@@ -3,7 +3,7 @@ Tests for AI service prompt loading and validation.
 """
 import pytest
 import json
-from app.services.ai_service import AIService, flatten_questions
+from app.services.ai_service import AIService, PLACEHOLDER_RE, flatten_questions
 
 
 def test_load_prompt_template():
@@ -23,6 +23,42 @@ def test_load_prompt_template():
     assert 'sections' in schema['required']
 
 
+def test_render_prompt():
+    """Test every placeholder in a template is substituted."""
+    template = AIService.load_prompt_template('v1_structured')
+    
+    prompt = AIService.render_prompt(template, {
+        'job_description': 'Senior Python developer',
+        'min_questions': '15'
+    })
+    
+    assert 'Senior Python developer' in prompt
+    assert '{{' not in prompt
+    # Repeated placeholders are all filled
+    assert prompt.count('15') >= template['user_template'].count('{{min_questions}}')
+
+
+def test_render_prompt_values_not_rescanned():
+    """Test substituted text containing placeholders is left untouched."""
+    template = {'user_template_parts': tuple(PLACEHOLDER_RE.split('JD: {{job_description}} ({{min_questions}})'))}
+    
+    prompt = AIService.render_prompt(template, {
+        'job_description': 'Use {{min_questions}} braces',
+        'min_questions': '15'
+    })
+    
+    assert prompt == 'JD: Use {{min_questions}} braces (15)'
+
+
+def test_render_prompt_missing_keys():
+    """Test placeholders without a value are kept as-is."""
+    template = {'user_template_parts': tuple(PLACEHOLDER_RE.split('{{skill}} at {{role_level}} level'))}
+    
+    prompt = AIService.render_prompt(template, {'skill': 'Flask'})
+    
+    assert prompt == 'Flask at {{role_level}} level'
+
+
 def test_validate_question_response():
     """Test question response validation."""
     valid_response = {
@@ -0,0 +1,57 @@
+"""
+Tests for the Redis-backed session interface.
+"""
+import logging
+import pytest
+from flask import Response
+from app.extensions import RedisSession, RedisSessionInterface
+
+
+def test_session_round_trip(app, fake_redis):
+    """Test a saved session is read back from Redis by its cookie."""
+    interface = RedisSessionInterface()
+    
+    with app.test_request_context():
+        session = RedisSession(interface.generate_sid(), new=True)
+        session['user_id'] = 'user-1'
+        response = Response()
+        interface.save_session(app, session, response)
+        
+        assert 'session:' + session.sid in fake_redis.data
+        assert session.sid in response.headers['Set-Cookie']
+    
+    cookie = f"{app.config['SESSION_COOKIE_NAME']}={session.sid}"
+    with app.test_request_context(headers={'Cookie': cookie}) as ctx:
+        opened = interface.open_session(app, ctx.request)
+        assert opened.sid == session.sid
+        assert opened['user_id'] == 'user-1'
+
+
+def test_session_write_failure_raises(app, fake_redis):
+    """Test a Redis failure fails the request instead of dropping the session."""
+    fake_redis.fail = True
+    interface = RedisSessionInterface()
+    
+    with app.test_request_context():
+        session = RedisSession(interface.generate_sid(), new=True)
+        session['user_id'] = 'user-1'
+        response = Response()
+        
+        with pytest.raises(ConnectionError):
+            interface.save_session(app, session, response)
+        assert 'Set-Cookie' not in response.headers
+
+
+def test_session_unreadable_data_logged(app, fake_redis, caplog):
+    """Test corrupt session data is logged and replaced with a new session."""
+    fake_redis.data['session:stale-sid'] = 'not-json'
+    interface = RedisSessionInterface()
+    
+    cookie = f"{app.config['SESSION_COOKIE_NAME']}=stale-sid"
+    with app.test_request_context(headers={'Cookie': cookie}) as ctx:
+        with caplog.at_level(logging.WARNING):
+            opened = interface.open_session(app, ctx.request)
+    
+    assert opened.new
+    assert opened.sid != 'stale-sid'
+    assert 'Session data unreadable' in caplog.text
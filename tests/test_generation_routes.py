@@ -0,0 +1,64 @@
+"""
+Tests for the generation results page.
+"""
+import pytest
+from app.services.supabase_service import SupabaseService
+
+
+@pytest.fixture
+def completed_generation(monkeypatch):
+    """A completed generation with one question, served without Supabase."""
+    gen_request = {
+        'id': 'gen-1',
+        'user_id': 'test-user-id',
+        'status': 'completed',
+        'created_at': '2024-05-01T12:30:00+00:00',
+        'role_level': 'Senior',
+        'extracted_skills': ['Python'],
+        'job_description': 'Senior Python developer'
+    }
+    questions = [{
+        'id': 'q-1',
+        'section_title': 'Python',
+        'question_type': 'Conceptual',
+        'difficulty': 'Senior',
+        'question_text': 'Explain the GIL',
+        'expected_signals': ['threads']
+    }]
+    fetches = []
+    
+    def get_questions_for_generation(gen_id, columns=None):
+        fetches.append(gen_id)
+        return questions
+    
+    monkeypatch.setattr(SupabaseService, 'get_generation_request',
+                        staticmethod(lambda gen_id, user_id=None: gen_request))
+    monkeypatch.setattr(SupabaseService, 'get_questions_for_generation',
+                        staticmethod(get_questions_for_generation))
+    return fetches
+
+
+def test_results_etag(auth_client, completed_generation):
+    """Test completed results carry an ETag and revalidate with a 304."""
+    response = auth_client.get('/generate/results/gen-1')
+    
+    assert response.status_code == 200
+    assert b'Explain the GIL' in response.data
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    
+    response = auth_client.get('/generate/results/gen-1', headers={'If-None-Match': etag})
+    
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+    # The questions are not fetched again for a 304
+    assert completed_generation == ['gen-1']
+
+
+def test_results_etag_mismatch(auth_client, completed_generation):
+    """Test a stale ETag gets the full page."""
+    response = auth_client.get('/generate/results/gen-1', headers={'If-None-Match': '"stale"'})
+    
+    assert response.status_code == 200
+    assert b'Explain the GIL' in response.data
@@ -0,0 +1,112 @@
+"""
+Tests for history pagination cursors and exports.
+"""
+import base64
+import json
+import pytest
+from app.routes.history import _encode_cursor, _decode_cursor
+from app.services.supabase_service import SupabaseService
+
+
+def _raw_cursor(value):
+    """Encode an arbitrary JSON value the way cursors are encoded."""
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def test_cursor_round_trip():
+    """Test a cursor decodes back to the generation's (created_at, id)."""
+    generation = {
+        'id': '3f1c2b9e-0000-4000-8000-000000000001',
+        'created_at': '2024-05-01T12:30:00.123456+00:00'
+    }
+    
+    cursor = _encode_cursor(generation)
+    
+    assert _decode_cursor(cursor) == (generation['created_at'], generation['id'])
+
+
+def test_cursor_missing():
+    """Test a missing cursor means the first page."""
+    assert _decode_cursor(None) is None
+    assert _decode_cursor('') is None
+
+
+def test_cursor_invalid():
+    """Test malformed and tampered cursors are rejected."""
+    # Not base64 / not JSON
+    assert _decode_cursor('not a cursor!') is None
+    assert _decode_cursor(base64.urlsafe_b64encode(b'\xff\xfe').decode()) is None
+    
+    # Valid JSON with the wrong shape
+    assert _decode_cursor(_raw_cursor(['2024-05-01T12:30:00+00:00'])) is None
+    assert _decode_cursor(_raw_cursor(['2024-05-01T12:30:00+00:00', 'id', 'extra'])) is None
+    assert _decode_cursor(_raw_cursor({'created_at': 'x', 'id': 'y'})) is None
+    
+    # Tampered values
+    assert _decode_cursor(_raw_cursor(['2024-05-01 OR 1=1', 'id'])) is None
+    assert _decode_cursor(_raw_cursor([12345, 'id'])) is None
+    assert _decode_cursor(_raw_cursor(['2024-05-01T12:30:00+00:00', ['id']])) is None
+
+
+@pytest.fixture
+def export_data(monkeypatch):
+    """A generation with one question, served to the export routes without Supabase."""
+    gen_request = {
+        'id': 'gen-1',
+        'created_at': '2024-05-01T12:30:00+00:00',
+        'role_level': 'Senior',
+        'extracted_skills': ['Python'],
+        'job_description': 'Senior Python developer'
+    }
+    questions = [{
+        'question_id': 'q1',
+        'section_title': 'Python',
+        'skill': 'Python',
+        'question_type': 'Conceptual',
+        'difficulty': 'Senior',
+        'question_text': 'Explain the GIL',
+        'expected_signals': ['threads'],
+        'generated_answer': None
+    }]
+    monkeypatch.setattr(SupabaseService, 'get_generation_with_questions',
+                        staticmethod(lambda gen_id, user_id: (gen_request, questions)))
+    return questions
+
+
+@pytest.mark.parametrize('kind', ['json', 'csv'])
+def test_export_etag(auth_client, export_data, kind):
+    """Test exports carry an ETag and revalidate with an empty 304."""
+    url = f'/history/gen-1/export/{kind}'
+    response = auth_client.get(url)
+    
+    assert response.status_code == 200
+    assert b'Explain the GIL' in response.data
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    
+    response = auth_client.get(url, headers={'If-None-Match': etag})
+    
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_export_etag_changes_with_answers(auth_client, export_data):
+    """Test saving an answer invalidates the previous export ETag."""
+    etag = auth_client.get('/history/gen-1/export/csv').headers['ETag']
+    
+    export_data[0]['generated_answer'] = 'It serializes bytecode execution.'
+    response = auth_client.get('/history/gen-1/export/csv', headers={'If-None-Match': etag})
+    
+    assert response.status_code == 200
+    assert b'It serializes bytecode execution.' in response.data
+    assert response.headers['ETag'] != etag
+
+
+def test_export_etag_per_format(auth_client, export_data):
+    """Test one format's ETag does not validate another format."""
+    etag = auth_client.get('/history/gen-1/export/json').headers['ETag']
+    
+    response = auth_client.get('/history/gen-1/export/csv', headers={'If-None-Match': etag})
+    
+    assert response.status_code == 200
@@ -0,0 +1,20 @@
+"""
+Tests for API key management routes.
+"""
+from app.services.supabase_service import SupabaseService
+
+
+def test_delete_key_survives_eviction_failure(auth_client, monkeypatch):
+    """Test a successful delete is reported even if cached model eviction fails."""
+    deleted = []
+    monkeypatch.setattr(SupabaseService, 'get_api_key',
+                        staticmethod(lambda user_id, key_id: {'id': key_id, 'encrypted_key': 'not-a-fernet-token'}))
+    monkeypatch.setattr(SupabaseService, 'delete_api_key',
+                        staticmethod(lambda key_id, user_id: deleted.append(key_id)))
+    
+    response = auth_client.post('/profile/keys/key-1/delete')
+    
+    assert response.status_code == 302
+    assert deleted == ['key-1']
+    with auth_client.session_transaction() as sess:
+        assert sess['_flashes'] == [('success', 'API key deleted successfully.')]
@@ -2,7 +2,7 @@
 Tests for security service including encryption and validation.
 """
 import pytest
-from app.services.security_service import SecurityService, validate_jd_word_count
+from app.services.security_service import SecurityService, OTPService, validate_jd_word_count
 from cryptography.fernet import Fernet
 
 
@@ -87,3 +87,60 @@ def test_session_token_generation():
     assert len(token1) == 64  # 32 bytes = 64 hex chars
     assert token1 != token2  # Should be unique
     assert all(c in '0123456789abcdef' for c in token1)  # Hex chars only
+
+
+def test_otp_verify(app, fake_redis):
+    """Test a generated OTP is stored in Redis and accepted exactly once."""
+    with app.app_context():
+        otp = OTPService.generate_otp('user@example.com')
+        
+        assert len(otp) == 6 and otp.isdigit()
+        assert fake_redis.hgetall('otp:user@example.com') == {'code': otp, 'attempts': '0'}
+        
+        is_valid, msg = OTPService.verify_otp('user@example.com', otp)
+        assert is_valid is True
+        assert msg == ""
+        assert fake_redis.hgetall('otp:user@example.com') == {}
+        
+        # Already consumed
+        is_valid, msg = OTPService.verify_otp('user@example.com', otp)
+        assert is_valid is False
+        assert "No valid OTP" in msg
+
+
+def test_otp_wrong_code_counts_attempts(app, fake_redis):
+    """Test wrong codes use up attempts until the OTP is discarded."""
+    with app.app_context():
+        max_attempts = app.config['MAX_OTP_ATTEMPTS']
+        otp = OTPService.generate_otp('user@example.com')
+        wrong = f"{(int(otp) + 1) % 1000000:06d}"
+        
+        is_valid, msg = OTPService.verify_otp('user@example.com', wrong)
+        assert is_valid is False
+        assert f"{max_attempts - 1} attempts remaining" in msg
+        
+        # Missing and differently sized codes are compared safely
+        assert OTPService.verify_otp('user@example.com', None)[0] is False
+        assert OTPService.verify_otp('user@example.com', otp + '0')[0] is False
+        
+        for _ in range(max_attempts - 3):
+            OTPService.verify_otp('user@example.com', wrong)
+        
+        # Even the right code is refused once attempts are exhausted
+        is_valid, msg = OTPService.verify_otp('user@example.com', otp)
+        assert is_valid is False
+        assert "Maximum verification attempts" in msg
+        assert fake_redis.hgetall('otp:user@example.com') == {}
+
+
+def test_otp_regenerate_resets(app, fake_redis):
+    """Test a new OTP replaces the previous code and its attempt count."""
+    with app.app_context():
+        first = OTPService.generate_otp('user@example.com')
+        OTPService.verify_otp('user@example.com', 'bad')
+        second = OTPService.generate_otp('user@example.com')
+        
+        assert fake_redis.hgetall('otp:user@example.com')['attempts'] == '0'
+        if first != second:
+            assert OTPService.verify_otp('user@example.com', first)[0] is False
+        assert OTPService.verify_otp('user@example.com', second)[0] is True
@@ -0,0 +1,110 @@
+"""
+Tests for Supabase service user updates, key usage and activity logging.
+"""
+import pytest
+from app.extensions import cache
+from app.services.supabase_service import SupabaseService, KEY_USAGE_PENDING
+from app.services.task_service import TaskService
+
+
+@pytest.fixture
+def users_table(monkeypatch):
+    """Record update calls on the users table and cache deletes."""
+    calls = {'updates': [], 'cache_deletes': []}
+    
+    class Query:
+        def update(self, data):
+            calls['updates'].append(data)
+            return self
+        
+        def eq(self, field, value):
+            return self
+        
+        def execute(self):
+            class Response:
+                data = [{'id': 'test-user-id', **calls['updates'][-1]}]
+            return Response()
+    
+    class Client:
+        def table(self, name):
+            assert name == 'users'
+            return Query()
+    
+    monkeypatch.setattr(SupabaseService, 'get_client', staticmethod(lambda *args, **kwargs: Client()))
+    monkeypatch.setattr(cache, 'delete', lambda key: calls['cache_deletes'].append(key))
+    return calls
+
+
+def test_update_user_noop_skipped(app, users_table):
+    """Test an update with nothing but updated_at never reaches Supabase."""
+    with app.app_context():
+        assert SupabaseService.update_user('test-user-id', {}) is None
+        assert SupabaseService.update_user('test-user-id', {'updated_at': '2024-05-01T00:00:00'}) is None
+    
+    assert users_table['updates'] == []
+    assert users_table['cache_deletes'] == []
+
+
+def test_update_user(app, users_table):
+    """Test a real update is written, stamped and invalidates the cached user."""
+    with app.app_context():
+        user = SupabaseService.update_user('test-user-id', {'display_name': 'New Name'})
+    
+    assert user['display_name'] == 'New Name'
+    assert 'updated_at' in users_table['updates'][0]
+    assert users_table['cache_deletes'] == ['user:test-user-id']
+
+
+def test_get_pending_key_usage(app, fake_redis, monkeypatch):
+    """Test buffered usage counts are read per key without flushing them."""
+    monkeypatch.setitem(app.config, 'KEY_USAGE_BUFFERED', True)
+    fake_redis.hincrby(KEY_USAGE_PENDING, 'key-1', 3)
+    
+    with app.app_context():
+        pending = SupabaseService.get_pending_key_usage(['key-1', 'key-2'])
+    
+    assert pending == {'key-1': 3}
+    assert fake_redis.hgetall(KEY_USAGE_PENDING) == {'key-1': '3'}
+
+
+def test_get_pending_key_usage_redis_down(app, fake_redis, monkeypatch):
+    """Test a Redis failure shows stored counts only instead of failing the page."""
+    monkeypatch.setitem(app.config, 'KEY_USAGE_BUFFERED', True)
+    fake_redis.fail = True
+    
+    with app.app_context():
+        assert SupabaseService.get_pending_key_usage(['key-1']) == {}
+
+
+def test_activity_logs_batched(app, monkeypatch):
+    """Test several log calls are written by one drain in one multi-row insert."""
+    inserts = []
+    submitted = []
+    
+    class Client:
+        def table(self, name):
+            assert name == 'activity_logs'
+            return self
+        
+        def insert(self, rows):
+            inserts.append(rows)
+            return self
+        
+        def execute(self):
+            return None
+    
+    monkeypatch.setattr(SupabaseService, 'get_client', staticmethod(lambda *args, **kwargs: Client()))
+    # Hold the drain task so the calls below buffer behind it
+    monkeypatch.setattr(TaskService, 'submit_to',
+                        staticmethod(lambda pool, func, *args, **kwargs: submitted.append((pool, func))))
+    
+    with app.app_context():
+        for action in ('login', 'generate_questions', 'export_csv'):
+            SupabaseService.log_activity_async('test-user-id', action)
+        
+        assert [pool for pool, func in submitted] == ['activity']
+        submitted[0][1]()
+    
+    assert len(inserts) == 1
+    assert [row['action'] for row in inserts[0]] == ['login', 'generate_questions', 'export_csv']
+    assert SupabaseService._activity_drain_scheduled is False
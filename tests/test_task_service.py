@@ -0,0 +1,28 @@
+"""
+Tests for background task pools.
+"""
+from app.services.task_service import TaskService
+
+
+def test_disabled_pool_runs_inline(app):
+    """Test a disabled pool runs work in the calling thread."""
+    calls = []
+    
+    with app.app_context():
+        future = TaskService.submit(calls.append, 'generation')
+    
+    assert future is None
+    assert calls == ['generation']
+
+
+def test_activity_pool_independent_of_background_tasks(app, monkeypatch):
+    """Test activity work stays in the background when generation runs inline."""
+    monkeypatch.setitem(app.config, 'BACKGROUND_TASKS_ENABLED', False)
+    monkeypatch.setitem(app.config, 'ACTIVITY_LOG_ASYNC', True)
+    
+    with app.app_context():
+        future = TaskService.submit_to('activity', lambda: 'logged')
+        
+        assert future is not None
+        assert future.result(timeout=5) == 'logged'
+        assert TaskService.submit(lambda: 'generated') is None